@@ -0,0 +1,89 @@
+"""
+Benchmark de la ruta síncrona frente a la asíncrona de /api/items.
+
+Levanta la aplicación en el mismo proceso (sin red) sobre una base de datos
+temporal y lanza N clientes concurrentes con httpx. La ruta "sync" usa
+handlers `def` (pool de hilos por defecto de Starlette) que llaman a la
+lógica de negocio síncrona; la ruta "async" es la aplicación real, con
+handlers `async def` y su ejecutor acotado.
+
+Uso (desde labs/Laboratorio10):
+    python -m benchmarks.bench_async --concurrency 100 1000 --requests 5000
+"""
+
+import argparse
+import asyncio
+import logging
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+from fastapi import APIRouter, FastAPI
+
+from benchmarks.harness import drive
+from microservice.main import get_application
+from microservice.services import business_logic, database
+from microservice.utils.logger import logger
+
+
+def build_sync_app() -> FastAPI:
+    """
+    Aplicación equivalente a la real pero con handlers síncronos.
+    """
+    app = get_application()
+    app.router.routes = [r for r in app.router.routes if not r.path.startswith("/api/items")]
+    router = APIRouter(prefix="/api/items")
+
+    @router.post("/", status_code=201)
+    def create_item(item: Dict[str, Optional[str]]):
+        return business_logic.create_item(item["name"], item.get("description"))
+
+    @router.get("/")
+    def list_items(limit: int = 100):
+        return business_logic.get_all_items(limit=limit)
+
+    app.include_router(router)
+    return app
+
+
+def mixed_request(tag: str):
+    """Mitad POST y mitad GET, como en un tráfico de lectura/escritura equilibrado."""
+
+    def request(client: httpx.AsyncClient, i: int):
+        if i % 2 == 0:
+            return client.post("/api/items/", json={"name": f"{tag}-{i}"})
+        return client.get("/api/items/", params={"limit": 100})
+
+    return request
+
+
+async def run(concurrency_levels: List[int], total: int) -> None:
+    logger.setLevel(logging.WARNING)
+    print(f"{'ruta':<6} {'clientes':>8} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9}")
+    for mode, factory in (("sync", build_sync_app), ("async", get_application)):
+        for concurrency in concurrency_levels:
+            with tempfile.TemporaryDirectory() as tmp:
+                database.DB_PATH = Path(tmp) / "bench.db"
+                app = factory()
+                await app.router.startup()
+                try:
+                    result = await drive(app, concurrency, total, mixed_request(f"{mode}-{concurrency}"))
+                finally:
+                    await app.router.shutdown()
+            print(
+                f"{mode:<6} {concurrency:>8} {result['throughput_rps']:>10.0f} "
+                f"{result['p50_ms']:>9.1f} {result['p99_ms']:>9.1f}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--requests", type=int, default=5000, help="Peticiones por escenario")
+    args = parser.parse_args()
+    asyncio.run(run(args.concurrency, args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Coste por fila de serializar el listado de ítems.
+
+Compara tres formas de producir el cuerpo de GET /api/items/:
+- "response_model": dicts de `database.list_items` validados contra
+  List[ItemOut] y codificados como lo hace FastAPI (ruta original).
+- "json.dumps": los mismos dicts codificados directamente con json.dumps.
+- "sqlite json": `database.list_items_json`, que construye el JSON en SQLite.
+
+Uso (desde labs/Laboratorio10):
+    python -m benchmarks.bench_serialization --rows 1000 10000 100000
+"""
+
+import argparse
+import json
+import logging
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from microservice.api.routes import ItemOut
+from microservice.services import database
+from microservice.utils.logger import logger
+
+ITEMS_ADAPTER = TypeAdapter(List[ItemOut])
+
+
+def via_response_model(rows: int) -> bytes:
+    items = database.list_items(limit=rows)
+    validated = ITEMS_ADAPTER.validate_python(items)
+    return json.dumps(jsonable_encoder(validated)).encode("utf-8")
+
+
+def via_json_dumps(rows: int) -> bytes:
+    items = database.list_items(limit=rows)
+    public = [{"id": i["id"], "name": i["name"], "description": i["description"]} for i in items]
+    return json.dumps(public, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def via_sqlite_json(rows: int) -> bytes:
+    return database.list_items_json(limit=rows)[0]
+
+
+def time_per_row(fn: Callable[[int], bytes], rows: int, repeat: int) -> float:
+    """Mejor tiempo de `repeat` ejecuciones, en microsegundos por fila."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(rows)
+        best = min(best, time.perf_counter() - start)
+    return best / rows * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    logger.setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = Path(tmp) / "bench.db"
+        database.init_db()
+        database.add_items([(f"item-{i}", f"descripción {i}") for i in range(max(args.rows))])
+
+        methods = (
+            ("response_model", via_response_model),
+            ("json.dumps", via_json_dumps),
+            ("sqlite json", via_sqlite_json),
+        )
+        print(f"{'filas':>8} " + " ".join(f"{name + ' µs/fila':>22}" for name, _ in methods))
+        for rows in args.rows:
+            costs = [time_per_row(fn, rows, args.repeat) for _, fn in methods]
+            print(f"{rows:>8} " + " ".join(f"{cost:>22.2f}" for cost in costs))
+        database.close_pool()
+
+
+if __name__ == "__main__":
+    main()
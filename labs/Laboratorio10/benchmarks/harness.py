@@ -0,0 +1,285 @@
+"""
+Banco de pruebas de rendimiento para el microservicio de Lab10.
+
+Siembra N ítems en una base de datos temporal, levanta la aplicación FastAPI
+en el mismo proceso (sin red, con httpx.ASGITransport) y lanza
+`POST /api/items/`, `GET /api/items/` y `GET /api/items/search` con una
+concurrencia fija. Para cada escenario informa throughput y percentiles de
+latencia.
+
+La búsqueda pide el número de un ítem sembrado al azar (un término
+selectivo, como buscar un ítem concreto) y se compara con el objetivo de
+latencia SEARCH_TARGET_P99_MS (ajustable con --search-target-p99-ms); el
+objetivo está pensado para una tabla de un millón de ítems con la
+concurrencia por defecto (`make bench-search`), y si no se cumple el
+proceso termina con código 1. Los términos que aparecen en gran parte de la tabla cuestan
+más: bm25 puntúa todas sus coincidencias antes de ordenar.
+
+Opcionalmente perfila la ejecución:
+- `--profile cprofile`: guarda `profile.prof` (pstats; abrir con snakeviz o
+  convertir con flameprof). Solo ve el hilo del event loop.
+- `--profile sample`: muestreo de todos los hilos (incluidos los de base de
+  datos) y guarda `stacks.folded` en formato "collapsed stacks", listo para
+  flamegraph.pl o https://www.speedscope.app.
+
+Uso (desde labs/Laboratorio10):
+    python -m benchmarks.harness --items 10000 --concurrency 50 --requests 5000
+    python -m benchmarks.harness --profile sample --output bench-results
+    python -m benchmarks.harness --items 1000000 --only search
+"""
+
+import argparse
+import asyncio
+import cProfile
+import json
+import logging
+import pstats
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+from fastapi import FastAPI
+
+from microservice.main import get_application
+from microservice.services import database
+from microservice.utils.logger import logger
+
+SEED_CHUNK = 10000
+# Objetivo de p99 de la búsqueda con términos selectivos (ms), con un millón
+# de ítems y 50 clientes concurrentes (la espera en cola domina la latencia)
+SEARCH_TARGET_P99_MS = 100.0
+
+SCENARIOS = {
+    "post": "POST /api/items/",
+    "get": "GET /api/items/",
+    "search": "GET /api/items/search",
+}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentil por el método del rango más cercano."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    """Throughput y percentiles (en ms) de una serie de latencias en segundos."""
+    return {
+        "requests": len(latencies),
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p90_ms": percentile(latencies, 90) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": max(latencies) * 1000,
+    }
+
+
+def seed(items: int) -> None:
+    """Inserta `items` ítems con la carga masiva, en bloques."""
+    for start in range(0, items, SEED_CHUNK):
+        database.add_items(
+            [(f"seed-{i}", f"ítem sembrado {i}") for i in range(start, min(items, start + SEED_CHUNK))]
+        )
+
+
+async def drive(
+    app: FastAPI,
+    concurrency: int,
+    total: int,
+    request: Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]],
+) -> Dict[str, float]:
+    """
+    Ejecuta `total` peticiones repartidas entre `concurrency` clientes
+    concurrentes. `request(client, i)` emite la i-ésima petición.
+    """
+    latencies: List[float] = []
+    counter = iter(range(total))
+    transport = httpx.ASGITransport(app=app)
+
+    async def client_loop(client: httpx.AsyncClient) -> None:
+        for i in counter:
+            start = time.perf_counter()
+            resp = await request(client, i)
+            latencies.append(time.perf_counter() - start)
+            resp.raise_for_status()
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return summarize(latencies, elapsed)
+
+
+class SamplingProfiler:
+    """
+    Perfilador por muestreo de todos los hilos del proceso.
+
+    Cada `interval` segundos toma la pila de cada hilo con
+    `sys._current_frames()` y acumula cuántas veces aparece cada pila.
+    """
+
+    def __init__(self, interval: float = 0.005) -> None:
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def __enter__(self) -> "SamplingProfiler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def write_folded(self, path: Path) -> None:
+        """Guarda las pilas en formato "collapsed stacks" (una por línea)."""
+        with path.open("w", encoding="utf-8") as fh:
+            for stack, count in self.stacks.most_common():
+                fh.write(f"{stack} {count}\n")
+
+
+def post_request(client: httpx.AsyncClient, i: int) -> Awaitable[httpx.Response]:
+    return client.post("/api/items/", json={"name": f"bench-{i}", "description": "benchmark"})
+
+
+def get_request_factory(items: int, page_size: int, seed_value: int) -> Callable:
+    rng = random.Random(seed_value)
+
+    def get_request(client: httpx.AsyncClient, i: int) -> Awaitable[httpx.Response]:
+        params = {"limit": page_size}
+        if items:
+            params["after_id"] = rng.randrange(items)
+        return client.get("/api/items/", params=params)
+
+    return get_request
+
+
+def search_request_factory(items: int, seed_value: int) -> Callable:
+    rng = random.Random(seed_value)
+
+    def search_request(client: httpx.AsyncClient, i: int) -> Awaitable[httpx.Response]:
+        # Desde items // 10 ningún otro número sembrado empieza igual: una coincidencia
+        term = rng.randrange(items // 10, items) if items >= 10 else "sembrado"
+        return client.get("/api/items/search", params={"q": str(term)})
+
+    return search_request
+
+
+async def run_scenarios(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    app = get_application()
+    await app.router.startup()
+    try:
+        seed(args.items)
+        requests = {
+            "post": post_request,
+            "get": get_request_factory(args.items, args.page_size, args.seed),
+            "search": search_request_factory(args.items, args.seed),
+        }
+        results = {}
+        for key, request in requests.items():
+            if args.only and key != args.only:
+                continue
+            results[SCENARIOS[key]] = await drive(app, args.concurrency, args.requests, request)
+        search = results.get(SCENARIOS["search"])
+        if search is not None:
+            search["target_p99_ms"] = args.search_target_p99_ms
+            search["meets_target"] = search["p99_ms"] <= args.search_target_p99_ms
+        return results
+    finally:
+        await app.router.shutdown()
+
+
+def run(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    """Ejecuta los escenarios (perfilados si se pidió) y guarda los artefactos."""
+    output = Path(args.output)
+    output.mkdir(parents=True, exist_ok=True)
+    profiler: Optional[cProfile.Profile] = None
+    sampler: Optional[SamplingProfiler] = None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = Path(tmp) / "bench.db"
+        if args.profile == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+        elif args.profile == "sample":
+            sampler = SamplingProfiler(interval=args.sample_interval / 1000)
+            sampler.__enter__()
+        try:
+            results = asyncio.run(run_scenarios(args))
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            if sampler is not None:
+                sampler.__exit__(None, None, None)
+
+    if profiler is not None:
+        profiler.dump_stats(output / "profile.prof")
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(20)
+    if sampler is not None:
+        sampler.write_folded(output / "stacks.folded")
+    (output / "results.json").write_text(
+        json.dumps({"params": vars(args), "results": results}, indent=2), encoding="utf-8"
+    )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=10000, help="Ítems sembrados antes de medir")
+    parser.add_argument("--concurrency", type=int, default=50, help="Clientes concurrentes")
+    parser.add_argument("--requests", type=int, default=5000, help="Peticiones por escenario")
+    parser.add_argument("--page-size", type=int, default=100, help="`limit` de los GET")
+    parser.add_argument("--only", choices=list(SCENARIOS), help="Ejecutar un solo escenario")
+    parser.add_argument("--search-target-p99-ms", type=float, default=SEARCH_TARGET_P99_MS,
+                        help="Objetivo de p99 de la búsqueda (ms)")
+    parser.add_argument("--profile", choices=["cprofile", "sample"], help="Perfilar la ejecución")
+    parser.add_argument("--sample-interval", type=float, default=5.0, help="Intervalo de muestreo (ms)")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla de los cursores aleatorios")
+    parser.add_argument("--output", default="bench-results", help="Directorio de resultados")
+    args = parser.parse_args()
+
+    logger.setLevel(logging.WARNING)
+    results = run(args)
+    print(f"{'escenario':<22} {'req/s':>9} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, r in results.items():
+        print(
+            f"{name:<22} {r['throughput_rps']:>9.0f} {r['p50_ms']:>8.1f} "
+            f"{r['p90_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['max_ms']:>8.1f}"
+        )
+    search = results.get(SCENARIOS["search"])
+    if search is not None:
+        verdict = "cumple" if search["meets_target"] else "NO cumple"
+        print(f"Búsqueda con {args.items} ítems: p99 {search['p99_ms']:.1f} ms, {verdict} el objetivo de {search['target_p99_ms']:.0f} ms")
+    print(f"Resultados en {args.output}/")
+    if search is not None and not search["meets_target"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
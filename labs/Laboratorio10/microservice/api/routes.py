@@ -1,9 +1,13 @@
+import hashlib
+import json
+import sqlite3
+from datetime import datetime
 from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Body, Header, HTTPException, Query, Request, Response, status
 from pydantic import BaseModel, Field
 
-from microservice.services import business_logic
+from microservice.services import business_logic, idempotency
 from microservice.utils.logger import logger
 
 router = APIRouter(
@@ -11,6 +15,20 @@ router = APIRouter(
     tags=["items"]
 )
 
+# Tamaño de página por defecto y máximo del listado
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# Tamaño de página por defecto y máximo de la búsqueda
+DEFAULT_SEARCH_SIZE = 20
+MAX_SEARCH_SIZE = 100
+# Máximo de ítems aceptados en una carga masiva
+MAX_BULK_ITEMS = 10000
+# Errores deterministas (nombre duplicado, datos no válidos): son los únicos
+# que se recuerdan para una Idempotency-Key; un timeout o un pool agotado
+# pueden ir bien al reintentar
+REPLAYABLE_ERRORS = (sqlite3.IntegrityError, ValueError)
+
+
 class ItemIn(BaseModel):
     """
     Modelo de datos para la creación de un ítem.
@@ -35,20 +53,140 @@ class ItemOut(ItemIn):
     status_code=status.HTTP_201_CREATED,
     summary="Crear un nuevo ítem"
 )
-def create_item(item: ItemIn) -> ItemOut:
+async def create_item(
+    item: ItemIn,
+    idempotency_key: Optional[str] = Header(
+        None,
+        alias="Idempotency-Key",
+        max_length=255,
+        description="Clave para reintentos seguros: repetirla devuelve la primera respuesta",
+    ),
+) -> ItemOut:
     """
     Crea un ítem nuevo usando la lógica de negocio.
+    Con `Idempotency-Key`, la primera respuesta (201, o 400 por un error
+    determinista como un nombre duplicado) se guarda y los reintentos con la
+    misma clave y el mismo cuerpo la reciben sin volver a escribir (cabecera
+    `Idempotent-Replayed: true`). Los errores transitorios (timeout, pool
+    agotado) no se guardan: el reintento vuelve a intentarlo.
     :param item: Datos de entrada para el ítem.
     :return: Ítem creado con su ID asignado.
     """
+    if idempotency_key is None:
+        return await _create_item(item)
+
+    fingerprint = hashlib.sha256(item.model_dump_json().encode("utf-8")).hexdigest()
+    async with idempotency.key_lock(idempotency_key):
+        stored = await idempotency.lookup(idempotency_key)
+        if stored is None:
+            try:
+                created = await _create_item(item)
+            except HTTPException as exc:
+                if isinstance(exc.__cause__, REPLAYABLE_ERRORS):
+                    body = json.dumps({"detail": exc.detail}).encode("utf-8")
+                    await idempotency.remember(idempotency_key, fingerprint, exc.status_code, body)
+                raise
+            body = ItemOut(**created).model_dump_json().encode("utf-8")
+            await idempotency.remember(idempotency_key, fingerprint, status.HTTP_201_CREATED, body)
+            return created
+
+    if stored.fingerprint != fingerprint:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="La Idempotency-Key ya se usó con otro cuerpo de petición"
+        )
+    return Response(
+        content=stored.body,
+        status_code=stored.status_code,
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+async def _create_item(item: ItemIn) -> dict:
     try:
-        created = business_logic.create_item(item.name, item.description)
-        return created
+        return await business_logic.create_item_async(item.name, item.description)
     except Exception as exc:
         logger.exception("Error al crear ítem")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(exc)
+        ) from exc
+
+
+class BulkConflict(BaseModel):
+    """
+    Ítem de una carga masiva que no se insertó por violar `UNIQUE(name)`.
+    """
+    index: int = Field(..., description="Posición del ítem en la lista enviada")
+    name: str = Field(..., description="Nombre en conflicto")
+    detail: str = Field(..., description="Motivo del conflicto")
+
+
+class BulkResult(BaseModel):
+    """
+    Resultado de una carga masiva: ítems creados y conflictos por fila.
+    """
+    created: List[ItemOut]
+    conflicts: List[BulkConflict]
+
+
+@router.post(
+    "/bulk",
+    response_model=BulkResult,
+    status_code=status.HTTP_200_OK,
+    summary="Crear muchos ítems en una sola transacción"
+)
+async def create_items_bulk(
+    items: List[ItemIn] = Body(..., min_length=1, max_length=MAX_BULK_ITEMS)
+) -> BulkResult:
+    """
+    Inserta una lista de ítems con una única transacción.
+    Los nombres duplicados se informan en `conflicts` sin abortar el lote.
+    :param items: Lista de ítems a crear.
+    :return: Ítems creados y conflictos por fila.
+    """
+    try:
+        created, conflicts = await business_logic.create_items_async(
+            [(item.name, item.description) for item in items]
+        )
+        return {"created": created, "conflicts": conflicts}
+    except Exception as exc:
+        logger.exception("Error en la carga masiva de ítems")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
+        )
+
+
+@router.get(
+    "/search",
+    response_model=List[ItemOut],
+    status_code=status.HTTP_200_OK,
+    summary="Buscar ítems por nombre o descripción"
+)
+async def search_items(
+    q: str = Query(..., min_length=1, max_length=200, description="Texto a buscar"),
+    limit: int = Query(DEFAULT_SEARCH_SIZE, ge=1, le=MAX_SEARCH_SIZE, description="Tamaño de página"),
+    offset: int = Query(0, ge=0, le=10000, description="Resultados a saltar"),
+) -> List[ItemOut]:
+    """
+    Búsqueda de texto completo (FTS5) ordenada por relevancia (bm25).
+    Cada palabra de `q` debe aparecer en el nombre o la descripción, como prefijo.
+    :return: Página de ítems coincidentes.
+    """
+    try:
+        return await business_logic.search_items_async(q, limit=limit, offset=offset)
+    except RuntimeError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(exc)
+        )
+    except Exception as exc:
+        logger.exception("Error al buscar ítems")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno al buscar ítems"
         )
 
 
@@ -56,18 +194,41 @@ def create_item(item: ItemIn) -> ItemOut:
     "/",
     response_model=List[ItemOut],
     status_code=status.HTTP_200_OK,
-    summary="Listar todos los ítems"
+    summary="Listar ítems (paginado)"
 )
-def list_items() -> List[ItemOut]:
+async def list_items(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Tamaño de página"),
+    after_id: Optional[int] = Query(None, ge=0, description="Último id de la página anterior"),
+    name: Optional[str] = Query(None, min_length=1, description="Prefijo del nombre"),
+    created_from: Optional[datetime] = Query(None, description="Creado desde (UTC, inclusive)"),
+    created_to: Optional[datetime] = Query(None, description="Creado hasta (UTC, exclusivo)"),
+) -> List[ItemOut]:
     """
-    Recupera la lista de todos los ítems existentes.
+    Recupera una página de ítems ordenada por id.
+    Si la página está llena, la cabecera `X-Next-After-Id` indica el cursor
+    para pedir la siguiente. Las páginas se sirven ya serializadas desde la
+    caché con un `ETag`; si coincide con `If-None-Match` se responde 304.
     :return: Lista de ítems.
     """
     try:
-        return business_logic.get_all_items()
+        page = await business_logic.get_items_page_async(
+            limit=limit,
+            after_id=after_id,
+            name_prefix=name,
+            created_from=created_from,
+            created_to=created_to,
+        )
     except Exception as exc:
         logger.exception("Error al listar ítems")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error interno al obtener los ítems"
         )
+
+    headers = {"ETag": page.etag}
+    if page.next_after_id is not None:
+        headers["X-Next-After-Id"] = str(page.next_after_id)
+    if request.headers.get("if-none-match") == page.etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=page.body, media_type="application/json", headers=headers)
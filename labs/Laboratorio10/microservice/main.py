@@ -2,7 +2,16 @@ from fastapi import FastAPI
 import uvicorn
 
 from microservice.api.routes import router as api_router
-from microservice.services.database import init_db
+from microservice.services.business_logic import invalidate_cache, shutdown_executor
+from microservice.services.database import (
+    close_pool,
+    init_db,
+    open_pool,
+    start_replica,
+    stop_replica,
+)
+from microservice.services.idempotency import init_store
+from microservice.services.write_queue import start_writer, stop_writer
 from microservice.utils.logger import logger
 
 def get_application() -> FastAPI:
@@ -25,18 +34,31 @@ def get_application() -> FastAPI:
     def on_startup() -> None:
         """
         Se ejecuta cuando la aplicación arranca.
-        Inicializa la base de datos y escribe en el log.
+        Abre el pool de conexiones, inicializa la base de datos, arranca la
+        réplica de lectura (si está activada) y el escritor con group commit,
+        y escribe en el log.
         """
         logger.info("Arrancando la aplicación")
+        open_pool()
         init_db()
+        init_store()
+        # Con READ_REPLICA=1 las lecturas salen de una copia en memoria; cada
+        # refresco invalida las páginas cacheadas a partir de la copia anterior
+        start_replica(listeners=[invalidate_cache])
+        start_writer()
 
     @app.on_event("shutdown")
     def on_shutdown() -> None:
         """
         Se ejecuta justo antes de que la aplicación se detenga.
-        Registra el evento de cierre en el log.
+        Registra el evento de cierre en el log, espera las consultas en curso,
+        vacía la cola de escritura, detiene la réplica y cierra el pool de conexiones.
         """
         logger.info("Deteniendo la aplicación")
+        shutdown_executor()
+        stop_writer()
+        stop_replica()
+        close_pool()
 
     return app
 
@@ -1,8 +1,44 @@
-from typing import Dict, List, Optional
+import asyncio
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
 
-from microservice.services import database
+from microservice.services import database, write_queue
 from microservice.utils.logger import logger
 
+# Segundos que una petición espera a que su grupo de escritura se confirme
+WRITE_TIMEOUT = 10.0
+# Hilos dedicados a la base de datos para la ruta asíncrona (igual que el pool)
+DB_WORKERS = database.POOL_SIZE
+
+# Páginas del listado que se mantienen serializadas en memoria (LRU)
+PAGE_CACHE_SIZE = 256
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+class CachedPage(NamedTuple):
+    """
+    Página del listado ya serializada a JSON, lista para enviarse tal cual.
+    """
+    body: bytes
+    etag: str
+    next_after_id: Optional[int]
+
+
+# Caché versionada: cada escritura incrementa la generación y vacía las páginas.
+# Es local al proceso; las escrituras de otros workers o procesos se detectan
+# con `database.data_version()` al consultar la caché.
+_generation = 0
+_data_version: Optional[Tuple[int, ...]] = None
+_page_cache: "OrderedDict[Tuple[Any, ...], CachedPage]" = OrderedDict()
+_cache_lock = threading.Lock()
+
 def create_item(name: str, description: Optional[str] = None) -> Dict[str, Optional[int or str]]:
     """
     Crea un nuevo ítem en la base de datos y devuelve su representación.
@@ -11,9 +47,21 @@ def create_item(name: str, description: Optional[str] = None) -> Dict[str, Optio
     :param description: Descripción opcional del ítem.
     :return: Diccionario con los campos 'id', 'name' y 'description'.
     """
-    # Insertar el ítem y obtener su ID
-    item_id = database.add_item(name, description)
+    # Insertar el ítem y obtener su ID: con el escritor activo la fila se
+    # confirma junto con otras inserciones concurrentes (group commit)
+    pending = write_queue.submit(name, description)
+    if pending is not None:
+        item_id = pending.result(timeout=WRITE_TIMEOUT)
+    else:
+        item_id = database.add_item(name, description)
 
+    return _created_item(item_id, name, description)
+
+
+def _created_item(item_id: int, name: str, description: Optional[str]) -> Dict[str, Optional[int or str]]:
+    """
+    Construye la representación de un ítem recién creado y registra la operación.
+    """
     # Construir la respuesta
     item = {
         "id": item_id,
@@ -21,22 +69,214 @@ def create_item(name: str, description: Optional[str] = None) -> Dict[str, Optio
         "description": description,
     }
 
+    invalidate_cache()
+
     # Registrar la operación de negocio
-    logger.info("Ítem creado por la lógica de negocio: %s", item)
+    logger.info(
+        "Ítem creado por la lógica de negocio", extra={"item_id": item_id, "item_name": name}
+    )
     return item
 
 
-def get_all_items() -> List[Dict[str, Optional[int or str]]]:
+def create_items(
+    items: List[Tuple[str, Optional[str]]]
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Crea muchos ítems en una sola transacción.
+
+    :param items: Lista de tuplas (name, description).
+    :return: Tupla (creados, conflictos) tal como la devuelve la capa de datos.
+    """
+    created, conflicts = database.add_items(items)
+    if created:
+        invalidate_cache()
+    logger.info(
+        "Lógica de negocio creó %d ítems en bloque (%d conflictos)", len(created), len(conflicts)
+    )
+    return created, conflicts
+
+
+def get_all_items(
+    limit: Optional[int] = None,
+    after_id: Optional[int] = None,
+    name_prefix: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+) -> List[Dict[str, Optional[int or str]]]:
     """
-    Recupera todos los ítems existentes en la base de datos.
+    Recupera una página de ítems existentes en la base de datos.
 
+    :param limit: Tamaño máximo de la página (None = todos).
+    :param after_id: Último id de la página anterior (paginación por clave).
+    :param name_prefix: Prefijo opcional del nombre.
+    :param created_from: Fecha de creación mínima (inclusive, UTC).
+    :param created_to: Fecha de creación máxima (exclusiva, UTC).
     :return: Lista de diccionarios, cada uno con 'id', 'name', 'description' y 'created_at'.
     """
     try:
-        items = database.list_items()
+        items = database.list_items(
+            limit=limit,
+            after_id=after_id,
+            name_prefix=name_prefix,
+            created_from=created_from,
+            created_to=created_to,
+        )
         logger.debug("Lógica de negocio obtuvo %d ítems", len(items))
         return items
     except Exception as exc:
         logger.exception("Error al recuperar los ítems")
         # En un escenario real, aquí se podría lanzar una excepción HTTP o propia
         return []
+
+
+def search_items(text: str, limit: int = 20, offset: int = 0) -> List[Dict[str, Optional[int or str]]]:
+    """
+    Busca ítems por nombre o descripción, ordenados por relevancia.
+
+    :param text: Texto a buscar.
+    :param limit: Tamaño de la página de resultados.
+    :param offset: Resultados a saltar.
+    :return: Lista de diccionarios con 'id', 'name', 'description' y 'created_at'.
+    """
+    items = database.search_items(text, limit=limit, offset=offset)
+    logger.debug("Búsqueda %r devolvió %d ítems", text, len(items))
+    return items
+
+
+def invalidate_cache() -> None:
+    """
+    Invalida todas las páginas cacheadas del listado. Se llama tras cada escritura.
+    """
+    global _generation
+    with _cache_lock:
+        _generation += 1
+        _page_cache.clear()
+
+
+def _cached_page(filters: Dict[str, Any]) -> Tuple[int, Tuple[Any, ...], Optional[CachedPage]]:
+    """
+    Busca una página en la caché. Devuelve (generación, clave, página o None).
+    Si otra conexión cambió la base desde la última consulta, vacía la caché.
+    """
+    global _data_version, _generation
+    version = database.data_version()
+    key = tuple(sorted(filters.items()))
+    with _cache_lock:
+        if version != _data_version:
+            _data_version = version
+            _generation += 1
+            _page_cache.clear()
+        page = _page_cache.get(key)
+        if page is not None:
+            _page_cache.move_to_end(key)
+        return _generation, key, page
+
+
+def _render_page(generation: int, key: Tuple[Any, ...], filters: Dict[str, Any]) -> CachedPage:
+    """
+    Obtiene la página ya serializada por SQLite y la guarda en la caché
+    solo si ninguna escritura cambió la generación mientras tanto.
+    """
+    body, count, last_id = database.list_items_json(**filters)
+    limit = filters.get("limit")
+    page = CachedPage(
+        body=body,
+        etag='"%s"' % hashlib.blake2b(body, digest_size=8).hexdigest(),
+        next_after_id=last_id if limit and count == limit else None,
+    )
+    with _cache_lock:
+        if generation == _generation:
+            _page_cache[key] = page
+            while len(_page_cache) > PAGE_CACHE_SIZE:
+                _page_cache.popitem(last=False)
+    return page
+
+
+def get_items_page(**filters: Any) -> CachedPage:
+    """
+    Devuelve una página del listado desde la caché o, si no está, desde SQLite.
+    Acepta los mismos filtros que `get_all_items`.
+    """
+    generation, key, page = _cached_page(filters)
+    if page is None:
+        page = _render_page(generation, key, filters)
+    return page
+
+
+# Ruta asíncrona: las rutas `async def` no ocupan hilos del pool por defecto
+# de Starlette; el trabajo bloqueante de SQLite va a un ejecutor acotado propio.
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="db")
+        return _executor
+
+
+def shutdown_executor() -> None:
+    """
+    Detiene el ejecutor de base de datos esperando las tareas en curso.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+async def run_in_db_thread(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Ejecuta una función bloqueante de base de datos en el ejecutor acotado.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(fn, *args, **kwargs))
+
+
+async def create_item_async(name: str, description: Optional[str] = None) -> Dict[str, Optional[int or str]]:
+    """
+    Versión asíncrona de `create_item`.
+
+    Con el escritor activo se espera su Future directamente en el event loop,
+    sin bloquear ningún hilo mientras se confirma el grupo. Un timeout o la
+    desconexión del cliente no cancelan la escritura ya encolada (shield).
+    """
+    pending = write_queue.submit(name, description)
+    if pending is None:
+        return await run_in_db_thread(create_item, name, description)
+    item_id = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(pending)), WRITE_TIMEOUT)
+    return _created_item(item_id, name, description)
+
+
+async def create_items_async(
+    items: List[Tuple[str, Optional[str]]]
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Versión asíncrona de `create_items`.
+    """
+    return await run_in_db_thread(create_items, items)
+
+
+async def get_all_items_async(**filters: Any) -> List[Dict[str, Optional[int or str]]]:
+    """
+    Versión asíncrona de `get_all_items`; acepta los mismos filtros.
+    """
+    return await run_in_db_thread(get_all_items, **filters)
+
+
+async def get_items_page_async(**filters: Any) -> CachedPage:
+    """
+    Versión asíncrona de `get_items_page`: los aciertos de caché se sirven
+    en el event loop y solo los fallos van al ejecutor de base de datos.
+    """
+    generation, key, page = _cached_page(filters)
+    if page is None:
+        page = await run_in_db_thread(_render_page, generation, key, filters)
+    return page
+
+
+async def search_items_async(text: str, limit: int = 20, offset: int = 0) -> List[Dict[str, Optional[int or str]]]:
+    """
+    Versión asíncrona de `search_items`.
+    """
+    return await run_in_db_thread(search_items, text, limit=limit, offset=offset)
@@ -1,20 +1,268 @@
-from contextlib import contextmanager
+import heapq
+import json
+import os
+import queue
+import sys
+import threading
+import zlib
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timezone
+from itertools import islice
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
 
 import sqlite3
 
 from microservice.utils.config import settings
 from microservice.utils.logger import logger
 
-DB_PATH = Path("app.db")
+# Archivo (Path) o URI `file:` (str) de la base de datos
+Target = Union[Path, str]
+
+# Nombre de la base compartida en memoria para `sqlite:///:memory:`
+MEMORY_DB_NAME = "microservice"
+
+
+def parse_database_url(url: str) -> Tuple[Target, int]:
+    """
+    Interpreta DATABASE_URL y devuelve (destino, número de shards).
+
+    Formas admitidas:
+    - `sqlite:///./app.db` (ruta relativa) o `sqlite:////ruta/absoluta.db`
+    - `sqlite:///:memory:`: base en memoria compartida por todas las conexiones
+      del pool (caché compartida); pensada para pruebas
+    - `?shards=N`: reparte los ítems por hash del nombre entre N bases
+
+    :raises ValueError: Si el esquema no es `sqlite` o `shards` no es válido.
+    """
+    parts = urlsplit(url)
+    if parts.scheme != "sqlite":
+        raise ValueError(f"DATABASE_URL no soportada (solo sqlite://): {url!r}")
+    shards = int(parse_qs(parts.query).get("shards", ["1"])[0])
+    if shards < 1:
+        raise ValueError(f"El número de shards debe ser >= 1: {url!r}")
+    path = parts.path[1:]
+    if path in ("", ":memory:"):
+        return f"file:{MEMORY_DB_NAME}?mode=memory&cache=shared", shards
+    return Path(path), shards
+
+
+DB_PATH, SHARDS = parse_database_url(settings()["DATABASE_URL"])
+
+# Número máximo de conexiones abiertas a la vez (una por hilo de trabajo activo)
+POOL_SIZE = 8
+# Sentencias preparadas que cada conexión mantiene en caché
+STATEMENT_CACHE_SIZE = 128
+
+# Réplica en memoria para lecturas (ver ReadReplica); desactivada por defecto
+READ_REPLICA = os.getenv("READ_REPLICA", "0") == "1"
+# Segundos entre comprobaciones periódicas de cambios para la réplica
+READ_REPLICA_REFRESH_SECONDS = float(os.getenv("READ_REPLICA_REFRESH_SECONDS", "5"))
+# Conexiones de lectura simultáneas a la réplica
+READ_REPLICA_POOL_SIZE = int(os.getenv("READ_REPLICA_POOL_SIZE", "4"))
+# Espera mínima tras una escritura para agrupar varias en un solo refresco
+READ_REPLICA_DEBOUNCE_SECONDS = 0.05
+
+# Parámetros por consulta al buscar nombres existentes (límite seguro de SQLite)
+IN_CHUNK_SIZE = 500
+
+# PRAGMAs aplicados a cada conexión nueva:
+# - WAL permite lectores concurrentes mientras hay un escritor.
+# - synchronous=NORMAL es seguro con WAL y evita un fsync por commit.
+# - cache_size negativo se expresa en KiB (aquí 16 MiB por conexión).
+# - mmap_size permite leer páginas mapeadas en memoria (256 MiB).
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA temp_store=MEMORY",
+)
+# En memoria compartida los lectores no toman bloqueos de tabla: sin esto
+# una lectura concurrente con el escritor fallaría con "table is locked"
+MEMORY_PRAGMAS = ("PRAGMA read_uncommitted=1",)
+
+
+def _is_memory(target: Target) -> bool:
+    return isinstance(target, str) and "mode=memory" in target
+
+
+def shard_targets(target: Target, shards: int) -> List[Target]:
+    """
+    Destinos de cada shard: `app.db` -> `app.shard0.db`, `app.shard1.db`, ...
+    (o una base en memoria con nombre propio por shard). Con un solo shard
+    se usa el destino tal cual.
+    """
+    if shards == 1:
+        return [target]
+    if isinstance(target, str):
+        base, _, query = target.partition("?")
+        return [f"{base}-shard{i}?{query}" for i in range(shards)]
+    return [target.with_name(f"{target.stem}.shard{i}{target.suffix}") for i in range(shards)]
+
+
+def shard_for(name: str) -> int:
+    """
+    Shard al que pertenece un ítem. Se reparte por hash estable (CRC32) del
+    nombre, así la restricción UNIQUE(name) de cada shard es global.
+    """
+    return zlib.crc32(name.encode("utf-8")) % SHARDS if SHARDS > 1 else 0
+
+
+def global_id(local_id: int, shard: int) -> int:
+    """
+    Id público de un ítem a partir de su id local en el shard. Intercalar
+    (`local * SHARDS + shard`) mantiene los ids únicos y deja que el orden
+    por id recorra todos los shards; con un solo shard coincide con el local.
+    """
+    return local_id * SHARDS + shard
+
+
+def _local_after_id(after_id: int, shard: int) -> int:
+    """Cursor local equivalente a `id > after_id` dentro de un shard."""
+    return (after_id - shard) // SHARDS
+
+
+class ConnectionPool:
+    """
+    Pool acotado de conexiones SQLite reutilizables.
+
+    Las conexiones se abren bajo demanda hasta `size` y se devuelven al pool
+    al terminar cada operación, de modo que el archivo y el esquema solo se
+    abren y analizan una vez por conexión.
+    """
+
+    def __init__(self, path: Target, size: int = POOL_SIZE) -> None:
+        self.path = path
+        self.size = size
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._opened = 0
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+            uri=isinstance(self.path, str),
+        )
+        for pragma in PRAGMAS + (MEMORY_PRAGMAS if _is_memory(self.path) else ()):
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self, timeout: float = 5.0) -> sqlite3.Connection:
+        """Entrega una conexión libre, abriendo una nueva si no se alcanzó el límite."""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("El pool de conexiones está cerrado")
+            can_open = self._opened < self.size
+            if can_open:
+                self._opened += 1
+        if can_open:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._opened -= 1
+                raise
+
+        return self._idle.get(timeout=timeout)
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        """Devuelve la conexión al pool (o la cierra si el pool ya se cerró)."""
+        with self._lock:
+            if not self._closed:
+                self._idle.put(conn)
+                return
+        conn.close()
+
+    def close(self) -> None:
+        """Cierra todas las conexiones libres; las que estén en uso se cierran al liberarse."""
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+# Un pool por shard, en el orden de `shard_targets`
+_pools: List[ConnectionPool] = []
+# Una conexión por shard que solo lee `PRAGMA data_version` (ver data_version)
+_version_pools: List[ConnectionPool] = []
+_pool_lock = threading.Lock()
+
+
+def open_pool() -> List[ConnectionPool]:
+    """
+    Crea los pools de conexiones globales (uno por shard) si aún no existen
+    y los devuelve.
+    """
+    global _pools, _version_pools
+    with _pool_lock:
+        if not _pools:
+            _pools = [ConnectionPool(target) for target in shard_targets(DB_PATH, SHARDS)]
+            _version_pools = [ConnectionPool(target, size=1) for target in shard_targets(DB_PATH, SHARDS)]
+            logger.info(
+                "Pool SQLite abierto en %s (%d shard(s), máx. %d conexiones por shard)",
+                DB_PATH, SHARDS, POOL_SIZE,
+            )
+        return _pools
+
+
+def close_pool() -> None:
+    """
+    Cierra los pools de conexiones globales. Un uso posterior abrirá otros nuevos.
+    """
+    global _pools, _version_pools
+    with _pool_lock:
+        if _pools:
+            for pool in _pools + _version_pools:
+                pool.close()
+            _pools, _version_pools = [], []
+            logger.info("Pool SQLite cerrado")
+
+
+def data_version() -> Tuple[int, ...]:
+    """
+    Versión de los datos de cada shard según `PRAGMA data_version`, leída en
+    una conexión propia que nunca escribe: cambia tras cada commit de
+    cualquier otra conexión, también de otros procesos (otro worker o
+    cualquier escritor del archivo). En memoria compartida no cambia.
+    """
+    if not _version_pools:
+        open_pool()
+    versions = []
+    for pool in _version_pools:
+        conn = pool.acquire()
+        try:
+            versions.append(conn.execute("PRAGMA data_version").fetchone()[0])
+        finally:
+            pool.release(conn)
+    return tuple(versions)
+
 
 def init_db() -> None:
     """
-    Inicializa la base de datos SQLite creando la tabla `items` si no existe todavía.
+    Inicializa la base de datos SQLite creando la tabla `items` (en cada shard)
+    si no existe todavía.
     """
-    logger.info("Inicializando base de datos en %s", DB_PATH)
-    with sqlite3.connect(DB_PATH) as conn:
+    logger.info("Inicializando base de datos en %s (%d shard(s))", DB_PATH, SHARDS)
+    for shard in range(SHARDS):
+        _init_schema(shard)
+    init_search_index()
+
+
+def _init_schema(shard: int) -> None:
+    with get_conn(shard) as conn:
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS items (
@@ -25,19 +273,279 @@ def init_db() -> None:
             )
             """
         )
+        # `name` ya tiene índice por ser UNIQUE; este cubre los filtros por fecha
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_items_created_at ON items (created_at)"
+        )
         conn.commit()
 
 
+# Índice de texto completo sobre name/description. Es una tabla FTS5 de
+# contenido externo: no duplica el texto, solo el índice, y los triggers la
+# mantienen sincronizada con `items`.
+FTS_SCHEMA = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+        name, description,
+        content='items', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS items_fts_ai AFTER INSERT ON items BEGIN
+        INSERT INTO items_fts (rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS items_fts_ad AFTER DELETE ON items BEGIN
+        INSERT INTO items_fts (items_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS items_fts_au AFTER UPDATE ON items BEGIN
+        INSERT INTO items_fts (items_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO items_fts (rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+)
+
+# Peso de cada columna en bm25: coincidir en el nombre cuenta más
+BM25_WEIGHTS = (10.0, 1.0)
+
+_fts_available = False
+
+
+def init_search_index() -> None:
+    """
+    Crea la tabla FTS5 y sus triggers. Si la tabla es nueva y ya había ítems,
+    reconstruye el índice a partir de `items`. Si SQLite no tiene FTS5, la
+    búsqueda queda deshabilitada y se registra un aviso.
+    """
+    global _fts_available
+    for shard in range(SHARDS):
+        with get_conn(shard) as conn:
+            existed = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'items_fts'"
+            ).fetchone()
+            try:
+                for statement in FTS_SCHEMA:
+                    conn.execute(statement)
+            except sqlite3.OperationalError as exc:
+                conn.rollback()
+                _fts_available = False
+                logger.warning("Búsqueda de texto completo no disponible: %s", exc)
+                return
+            if not existed:
+                conn.execute("INSERT INTO items_fts (items_fts) VALUES ('rebuild')")
+            conn.commit()
+    _fts_available = True
+
+
 @contextmanager
-def get_conn():
+def get_conn(shard: int = 0):
     """
-    Context manager para obtener y cerrar una conexión SQLite.
+    Context manager que toma una conexión del pool del shard indicado y la
+    devuelve al salir. Si la operación falla, deshace la transacción pendiente.
+    Las tablas auxiliares (p. ej. idempotencia) viven en el shard 0.
     """
-    conn = sqlite3.connect(DB_PATH)
+    pool = (_pools or open_pool())[shard]
+    conn = pool.acquire()
     try:
         yield conn
+    except Exception:
+        conn.rollback()
+        raise
     finally:
-        conn.close()
+        pool.release(conn)
+
+
+class _SnapshotPool(ConnectionPool):
+    """
+    Pool de conexiones `:memory:` independientes, cada una rellenada con su
+    propia copia de `snapshot` (otra conexión en memoria), para leer en
+    paralelo. `snapshot` se cierra con el pool.
+    """
+
+    def __init__(self, snapshot: sqlite3.Connection, size: int) -> None:
+        super().__init__(":memory:", size)
+        self.snapshot = snapshot
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(":memory:", check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+        self.snapshot.backup(conn)
+        return conn
+
+    def close(self) -> None:
+        super().close()
+        self.snapshot.close()
+
+
+class ReadReplica:
+    """
+    Copia completa de la base de datos en memoria para servir lecturas.
+
+    Cada refresco copia la base con la API de backup en línea de SQLite y
+    publica un pool nuevo de hasta `pool_size` conexiones en memoria con esa
+    copia (doble buffer): los lectores nunca ven una copia a medias y no se
+    esperan entre sí. Un hilo la refresca poco después de cada escritura
+    notificada y, cada `refresh_seconds`, solo si `PRAGMA data_version` indica
+    que otra conexión (p. ej. otro proceso) cambió la base; sin escrituras no
+    se copia nada ni se avisa a los listeners. Las escrituras siguen yendo al
+    archivo; las lecturas pueden ir por detrás hasta el siguiente refresco.
+    """
+
+    def __init__(
+        self,
+        refresh_seconds: float = READ_REPLICA_REFRESH_SECONDS,
+        debounce_seconds: float = READ_REPLICA_DEBOUNCE_SECONDS,
+        pool_size: int = READ_REPLICA_POOL_SIZE,
+    ) -> None:
+        self.refresh_seconds = refresh_seconds
+        self.debounce_seconds = debounce_seconds
+        self.pool_size = pool_size
+        self._pool: Optional[_SnapshotPool] = None
+        # Conexión propia a la base: `data_version` se compara en la misma conexión
+        self._source = ConnectionPool(DB_PATH, size=1)
+        self._data_version: Optional[int] = None
+        self._lock = threading.Lock()
+        self._dirty = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="read-replica", daemon=True)
+        self.listeners: List[Callable[[], None]] = []
+
+    def start(self) -> None:
+        self.refresh()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._dirty.set()
+        self._thread.join()
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.close()
+        self._source.close()
+
+    def mark_dirty(self) -> None:
+        self._dirty.set()
+
+    def refresh(self) -> None:
+        """Copia la base de datos en memoria y publica un pool de lectura nuevo."""
+        copy = sqlite3.connect(":memory:", check_same_thread=False)
+        source = self._source.acquire()
+        try:
+            # Leída antes de copiar: una escritura durante la copia provoca otro refresco
+            self._data_version = source.execute("PRAGMA data_version").fetchone()[0]
+            source.backup(copy)
+        except Exception:
+            copy.close()
+            raise
+        finally:
+            self._source.release(source)
+        pool = _SnapshotPool(copy, self.pool_size)
+        # El pool anterior no se cierra: los lectores que ya lo tomaron lo
+        # siguen usando y sus conexiones se liberan con él al soltarlo
+        with self._lock:
+            self._pool = pool
+        for listener in self.listeners:
+            listener()
+
+    def changed(self) -> bool:
+        """Indica si otra conexión confirmó cambios en la base desde el último refresco."""
+        source = self._source.acquire()
+        try:
+            return source.execute("PRAGMA data_version").fetchone()[0] != self._data_version
+        finally:
+            self._source.release(source)
+
+    @contextmanager
+    def connection(self):
+        with self._lock:
+            pool = self._pool
+        conn = pool.acquire()
+        try:
+            yield conn
+        finally:
+            pool.release(conn)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                if self._dirty.wait(timeout=self.refresh_seconds):
+                    # Agrupa las escrituras que lleguen justo después
+                    self._stop.wait(self.debounce_seconds)
+                elif not self.changed():
+                    continue
+                if self._stop.is_set():
+                    return
+                self._dirty.clear()
+                self.refresh()
+            except Exception:
+                logger.exception("No se pudo refrescar la réplica de lectura")
+
+
+_replica: Optional[ReadReplica] = None
+
+
+def start_replica(listeners: Optional[List[Callable[[], None]]] = None) -> None:
+    """
+    Arranca la réplica de lectura en memoria si READ_REPLICA=1.
+
+    :param listeners: Funciones a llamar tras cada refresco (p. ej. para
+                      invalidar cachés construidas a partir de la réplica).
+    """
+    global _replica
+    if not READ_REPLICA or _replica is not None:
+        return
+    if SHARDS > 1:
+        logger.warning("La réplica de lectura no admite almacenamiento particionado; se omite")
+        return
+    replica = ReadReplica()
+    replica.listeners.extend(listeners or [])
+    replica.start()
+    _replica = replica
+    logger.info(
+        "Réplica de lectura en memoria activa (%d conexiones, cambios comprobados cada %.1f s)",
+        replica.pool_size, replica.refresh_seconds,
+    )
+
+
+def stop_replica() -> None:
+    """
+    Detiene la réplica de lectura; las lecturas vuelven al archivo.
+    """
+    global _replica
+    if _replica is not None:
+        replica, _replica = _replica, None
+        replica.stop()
+        logger.info("Réplica de lectura detenida")
+
+
+def notify_write() -> None:
+    """
+    Avisa a la réplica (si existe) de que hubo una escritura confirmada.
+    """
+    if _replica is not None:
+        _replica.mark_dirty()
+
+
+@contextmanager
+def get_read_conn(shard: int = 0):
+    """
+    Conexión para consultas de solo lectura: la réplica en memoria si está
+    activa (solo existe sin shards) o, si no, una conexión del pool del shard.
+    """
+    if _replica is not None:
+        with _replica.connection() as conn:
+            yield conn
+    else:
+        with get_conn(shard) as conn:
+            yield conn
 
 
 def add_item(name: str, description: Optional[str] = None) -> int:
@@ -48,38 +556,312 @@ def add_item(name: str, description: Optional[str] = None) -> int:
     :param description: Descripción opcional del ítem.
     :return: ID del ítem insertado.
     """
-    with get_conn() as conn:
+    shard = shard_for(name)
+    with get_conn(shard) as conn:
         cursor = conn.cursor()
         cursor.execute(
             "INSERT INTO items (name, description) VALUES (?, ?)",
             (name, description)
         )
         conn.commit()
-        item_id = cursor.lastrowid
-        logger.info("Ítem insertado: %s (id=%d)", name, item_id)
+        notify_write()
+        item_id = global_id(cursor.lastrowid, shard)
+        logger.debug("Ítem insertado", extra={"item_id": item_id, "item_name": name})
         return item_id
 
 
-def list_items() -> List[Dict[str, Optional[str]]]:
+def _ids_by_name(conn: sqlite3.Connection, names: List[str]) -> Dict[str, int]:
+    """
+    Devuelve {name: id} para los nombres dados que ya existen en `items`,
+    consultando en bloques para no superar el límite de parámetros.
     """
-    Recupera todos los ítems de la tabla `items`.
+    found: Dict[str, int] = {}
+    for start in range(0, len(names), IN_CHUNK_SIZE):
+        chunk = names[start:start + IN_CHUNK_SIZE]
+        placeholders = ",".join("?" * len(chunk))
+        rows = conn.execute(
+            f"SELECT name, id FROM items WHERE name IN ({placeholders})", chunk
+        )
+        found.update(rows)
+    return found
 
-    :return: Lista de diccionarios con keys id, name, description y created_at.
+
+def add_items(
+    items: List[Tuple[str, Optional[str]]]
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
     """
-    with get_conn() as conn:
-        cursor = conn.execute(
-            "SELECT id, name, description, created_at FROM items"
+    Inserta muchos ítems en una sola transacción con `executemany`.
+
+    Los nombres que ya existen (o que se repiten dentro del lote) no abortan
+    la carga: se informan como conflictos con su posición en la entrada.
+    Con varios shards hay una transacción por shard.
+
+    :param items: Lista de tuplas (name, description).
+    :return: Tupla (creados, conflictos). Cada creado tiene id, name y
+             description; cada conflicto tiene index, name y detail.
+    """
+    conflicts: List[Dict[str, Any]] = []
+    pending: List[Tuple[int, str, Optional[str]]] = []
+    seen = set()
+    for index, (name, description) in enumerate(items):
+        if name in seen:
+            conflicts.append({"index": index, "name": name, "detail": "nombre repetido en el lote"})
+            continue
+        seen.add(name)
+        pending.append((index, name, description))
+
+    by_shard: Dict[int, List[Tuple[int, str, Optional[str]]]] = {}
+    for row in pending:
+        by_shard.setdefault(shard_for(row[1]), []).append(row)
+
+    created_at_index: List[Tuple[int, Dict[str, Any]]] = []
+    for shard, rows in by_shard.items():
+        with get_conn(shard) as conn:
+            # IMMEDIATE toma el bloqueo de escritura antes de comprobar duplicados,
+            # así ningún INSERT concurrente puede colarse entre la comprobación y la carga
+            conn.execute("BEGIN IMMEDIATE")
+            existing = _ids_by_name(conn, [name for _, name, _ in rows])
+            to_insert = [row for row in rows if row[1] not in existing]
+            conflicts.extend(
+                {"index": index, "name": name, "detail": "el nombre ya existe"}
+                for index, name, _ in rows
+                if name in existing
+            )
+            conn.executemany(
+                "INSERT INTO items (name, description) VALUES (?, ?)",
+                [(name, description) for _, name, description in to_insert],
+            )
+            ids = _ids_by_name(conn, [name for _, name, _ in to_insert])
+            conn.commit()
+        created_at_index.extend(
+            (index, {"id": global_id(ids[name], shard), "name": name, "description": description})
+            for index, name, description in to_insert
         )
-        rows = cursor.fetchall()
+    notify_write()
+
+    # Los creados se devuelven en el orden de la entrada, no agrupados por shard
+    created_at_index.sort(key=lambda pair: pair[0])
+    created = [item for _, item in created_at_index]
+    conflicts.sort(key=lambda c: c["index"])
+    logger.info("Carga masiva: %d ítems insertados, %d conflictos", len(created), len(conflicts))
+    return created, conflicts
+
+
+def _prefix_upper_bound(prefix: str) -> Optional[str]:
+    """
+    Menor cadena mayor que todas las que empiezan por `prefix`, para que el
+    filtro por prefijo sea un rango sobre el índice UNIQUE de `name`. Los
+    caracteres finales U+10FFFF no tienen siguiente y se descartan; si no
+    queda nada, no hay cota superior (None).
+    """
+    stem = prefix.rstrip(chr(sys.maxunicode))
+    if not stem:
+        return None
+    return stem[:-1] + chr(ord(stem[-1]) + 1)
+
+
+def _to_db_timestamp(value: datetime) -> str:
+    """
+    Convierte un datetime al formato de `created_at` ('YYYY-MM-DD HH:MM:SS', UTC).
+    """
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
 
-    result = [
-        {
-            "id": row[0],
+def _build_item_query(
+    shard: int = 0,
+    limit: Optional[int] = None,
+    after_id: Optional[int] = None,
+    name_prefix: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+) -> Tuple[str, List[Any]]:
+    """
+    Construye la consulta de listado con paginación por clave (keyset) sobre `id`
+    y los filtros opcionales de nombre y rango de fechas, para un shard.
+    El cursor `after_id` es un id global; los ids devueltos son locales.
+    """
+    clauses: List[str] = []
+    params: List[Any] = []
+    if after_id is not None:
+        clauses.append("id > ?")
+        params.append(_local_after_id(after_id, shard))
+    if name_prefix:
+        upper = _prefix_upper_bound(name_prefix)
+        clauses.append("name >= ?" if upper is None else "name >= ? AND name < ?")
+        params.extend([name_prefix] if upper is None else [name_prefix, upper])
+    if created_from is not None:
+        clauses.append("created_at >= ?")
+        params.append(_to_db_timestamp(created_from))
+    if created_to is not None:
+        clauses.append("created_at < ?")
+        params.append(_to_db_timestamp(created_to))
+
+    sql = "SELECT id, name, description, created_at FROM items"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY id"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return sql, params
+
+
+def iter_items(**filters: Any) -> Iterator[Dict[str, Optional[str]]]:
+    """
+    Recorre los ítems fila a fila sobre el cursor, sin cargar el resultado
+    completo en memoria. Acepta los mismos filtros que `list_items`.
+
+    Con varios shards cada uno se consulta con el mismo límite y los cursores
+    se mezclan en orden de id global (`heapq.merge`), sin ordenar en memoria.
+    """
+    with ExitStack() as stack:
+        streams = []
+        for shard in range(SHARDS):
+            sql, params = _build_item_query(shard, **filters)
+            conn = stack.enter_context(get_read_conn(shard))
+            streams.append(_shard_rows(conn.execute(sql, params), shard))
+        merged = heapq.merge(*streams, key=lambda item: item["id"]) if SHARDS > 1 else streams[0]
+        yield from islice(merged, filters.get("limit"))
+
+
+def _shard_rows(rows: Iterator[Tuple[Any, ...]], shard: int) -> Iterator[Dict[str, Optional[str]]]:
+    for row in rows:
+        yield {
+            "id": global_id(row[0], shard),
             "name": row[1],
             "description": row[2],
             "created_at": row[3],
         }
+
+
+def list_items(
+    limit: Optional[int] = None,
+    after_id: Optional[int] = None,
+    name_prefix: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+) -> List[Dict[str, Optional[str]]]:
+    """
+    Recupera una página de ítems de la tabla `items`, ordenada por `id`.
+
+    :param limit: Máximo de ítems a devolver (None = sin límite).
+    :param after_id: Devuelve solo ítems con id mayor (cursor de la página anterior).
+    :param name_prefix: Filtra por nombres que empiezan con este prefijo.
+    :param created_from: Incluye ítems creados en o después de este instante (UTC).
+    :param created_to: Incluye ítems creados antes de este instante (UTC).
+    :return: Lista de diccionarios con keys id, name, description y created_at.
+    """
+    result = list(
+        iter_items(
+            limit=limit,
+            after_id=after_id,
+            name_prefix=name_prefix,
+            created_from=created_from,
+            created_to=created_to,
+        )
+    )
+    logger.debug("Listado de ítems", extra={"rows": len(result)})
+    return result
+
+
+def list_items_json(**filters: Any) -> Tuple[bytes, int, Optional[int]]:
+    """
+    Devuelve una página del listado ya serializada como JSON por SQLite
+    (`json_group_array`), sin crear un dict por fila en Python. Solo incluye
+    los campos públicos id, name y description. Acepta los filtros de `list_items`.
+
+    :return: Tupla (cuerpo JSON en bytes, filas en la página, id de la última fila).
+    """
+    if SHARDS == 1:
+        sql, params = _build_item_query(**filters)
+        wrapped = (
+            "SELECT json_group_array("
+            "json_object('id', id, 'name', name, 'description', description)"
+            f"), count(*), max(id) FROM ({sql})"
+        )
+        with get_read_conn() as conn:
+            try:
+                body, count, last_id = conn.execute(wrapped, params).fetchone()
+                return body.encode("utf-8"), count, last_id
+            except sqlite3.OperationalError:
+                # SQLite compilado sin JSON1: se codifica en Python más abajo
+                pass
+
+    # Con varios shards la página sale de la mezcla de todos ellos
+    rows = [
+        {"id": item["id"], "name": item["name"], "description": item["description"]}
+        for item in iter_items(**filters)
+    ]
+    body = json.dumps(rows, ensure_ascii=False, separators=(",", ":"))
+    return body.encode("utf-8"), len(rows), rows[-1]["id"] if rows else None
+
+
+def _fts_query(text: str) -> str:
+    """
+    Convierte el texto del usuario en una consulta FTS5 segura: cada palabra
+    se cita (sin operadores ni sintaxis especial) y se busca como prefijo.
+    """
+    terms = text.split()
+    return " ".join('"%s"*' % term.replace('"', '""') for term in terms)
+
+
+def search_items(text: str, limit: int = 20, offset: int = 0) -> List[Dict[str, Optional[str]]]:
+    """
+    Busca ítems por nombre o descripción con FTS5, ordenados por relevancia (bm25).
+
+    Con varios shards cada uno aporta sus `limit + offset` mejores resultados
+    y se mezclan por puntuación. bm25 usa estadísticas de cada shard, así que
+    el orden global es aproximado cuando los shards están desequilibrados.
+
+    :param text: Palabras a buscar; todas deben aparecer (como prefijo).
+    :param limit: Máximo de resultados.
+    :param offset: Resultados a saltar (paginación).
+    :return: Lista de diccionarios con keys id, name, description y created_at.
+    """
+    if not _fts_available:
+        raise RuntimeError("La búsqueda de texto completo no está disponible (SQLite sin FTS5)")
+    query = _fts_query(text)
+    if not query:
+        return []
+
+    if SHARDS == 1:
+        hits = _search_shard(0, query, limit, offset)
+    else:
+        per_shard = [_search_shard(shard, query, limit + offset, 0) for shard in range(SHARDS)]
+        hits = list(islice(heapq.merge(*per_shard, key=lambda hit: hit[0]), offset, offset + limit))
+    return [item for _, item in hits]
+
+
+def _search_shard(
+    shard: int, query: str, limit: int, offset: int
+) -> List[Tuple[float, Dict[str, Optional[str]]]]:
+    """
+    Resultados de un shard como pares (puntuación bm25, ítem), de mejor a peor.
+    """
+    # Se ordena y pagina solo sobre el índice; la tabla `items` se consulta
+    # únicamente para las filas de la página, no para todas las coincidencias
+    with get_read_conn(shard) as conn:
+        rows = conn.execute(
+            """
+            SELECT items.id, items.name, items.description, items.created_at, hits.score
+            FROM (
+                SELECT rowid, bm25(items_fts, ?, ?) AS score
+                FROM items_fts
+                WHERE items_fts MATCH ?
+                ORDER BY score
+                LIMIT ? OFFSET ?
+            ) AS hits
+            JOIN items ON items.id = hits.rowid
+            ORDER BY hits.score
+            """,
+            (*BM25_WEIGHTS, query, limit, offset),
+        ).fetchall()
+    return [
+        (
+            row[4],
+            {"id": global_id(row[0], shard), "name": row[1], "description": row[2], "created_at": row[3]},
+        )
         for row in rows
     ]
-    logger.debug("Listado de ítems: %s", result)
-    return result
@@ -0,0 +1,155 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, NamedTuple, Optional
+
+from microservice.services import business_logic, database
+from microservice.utils.logger import logger
+
+# Tiempo que se recuerda la primera respuesta de cada clave (segundos)
+TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+# Máximo de claves en memoria (las menos usadas se descartan primero)
+MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+# Si es "1", las respuestas también se guardan en SQLite (sobreviven a reinicios
+# y se comparten entre workers que usan el mismo archivo)
+PERSIST = os.getenv("IDEMPOTENCY_PERSIST", "0") == "1"
+
+
+class StoredResponse(NamedTuple):
+    """
+    Primera respuesta registrada para una clave de idempotencia.
+    """
+    fingerprint: str
+    status_code: int
+    body: bytes
+    expires_at: float
+
+
+class IdempotencyCache:
+    """
+    Caché LRU con expiración (TTL) de respuestas por clave de idempotencia.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, ttl: float = TTL_SECONDS) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, StoredResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[StoredResponse]:
+        with self._lock:
+            stored = self._entries.get(key)
+            if stored is None:
+                return None
+            if stored.expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return stored
+
+    def put(self, key: str, stored: StoredResponse) -> None:
+        with self._lock:
+            self._entries[key] = stored
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = IdempotencyCache()
+# Claves con una petición en curso: las repeticiones concurrentes esperan a la primera
+_key_locks: Dict[str, asyncio.Lock] = {}
+_key_users: Dict[str, int] = {}
+
+
+def init_store() -> None:
+    """
+    Crea la tabla espejo en SQLite si la persistencia está activada.
+    """
+    if not PERSIST:
+        return
+    with database.get_conn() as conn:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS idempotency_keys (
+                key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                status_code INTEGER NOT NULL,
+                body BLOB NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("DELETE FROM idempotency_keys WHERE expires_at <= ?", (time.time(),))
+        conn.commit()
+
+
+def _load(key: str) -> Optional[StoredResponse]:
+    with database.get_conn() as conn:
+        row = conn.execute(
+            "SELECT fingerprint, status_code, body, expires_at FROM idempotency_keys "
+            "WHERE key = ? AND expires_at > ?",
+            (key, time.time()),
+        ).fetchone()
+    return StoredResponse(row[0], row[1], bytes(row[2]), row[3]) if row else None
+
+
+def _save(key: str, stored: StoredResponse) -> None:
+    with database.get_conn() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO idempotency_keys "
+            "(key, fingerprint, status_code, body, expires_at) VALUES (?, ?, ?, ?, ?)",
+            (key, *stored),
+        )
+        conn.commit()
+
+
+async def lookup(key: str) -> Optional[StoredResponse]:
+    """
+    Busca la respuesta guardada para `key`: primero en memoria y, si la
+    persistencia está activa, en SQLite (repoblando la memoria).
+    """
+    stored = _cache.get(key)
+    if stored is None and PERSIST:
+        stored = await business_logic.run_in_db_thread(_load, key)
+        if stored is not None:
+            _cache.put(key, stored)
+    return stored
+
+
+async def remember(key: str, fingerprint: str, status_code: int, body: bytes) -> None:
+    """
+    Guarda la primera respuesta de `key` en memoria (y en SQLite si procede).
+    """
+    stored = StoredResponse(fingerprint, status_code, body, time.time() + _cache.ttl)
+    _cache.put(key, stored)
+    if PERSIST:
+        try:
+            await business_logic.run_in_db_thread(_save, key, stored)
+        except Exception:
+            # La copia en memoria sigue respondiendo a los reintentos
+            logger.exception("No se pudo persistir la clave de idempotencia")
+
+
+@asynccontextmanager
+async def key_lock(key: str) -> AsyncIterator[None]:
+    """
+    Serializa las peticiones concurrentes con la misma clave, de modo que solo
+    la primera llegue a la ruta de escritura.
+    """
+    lock = _key_locks.setdefault(key, asyncio.Lock())
+    _key_users[key] = _key_users.get(key, 0) + 1
+    try:
+        async with lock:
+            yield
+    finally:
+        _key_users[key] -= 1
+        if not _key_users[key]:
+            del _key_users[key]
+            del _key_locks[key]
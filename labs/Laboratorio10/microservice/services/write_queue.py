@@ -0,0 +1,176 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+import sqlite3
+
+from microservice.services import database
+from microservice.utils.logger import logger
+
+# Tiempo máximo que el escritor espera para completar un grupo (segundos)
+MAX_DELAY = 0.002
+# Máximo de filas confirmadas en un mismo commit
+MAX_BATCH = 256
+
+_Pending = Tuple[str, Optional[str], "Future[int]"]
+
+_STOP = object()
+
+
+def _fail(batch: List[_Pending], exc: Exception) -> None:
+    """Resuelve con `exc` los Futures del grupo que sigan pendientes."""
+    for _, _, future in batch:
+        if not future.done():
+            future.set_exception(exc)
+
+
+class GroupCommitWriter:
+    """
+    Hilo escritor único que agrupa inserciones concurrentes en un solo commit.
+
+    Cada llamada a `submit` encola la fila y devuelve un Future que se resuelve
+    con el id de esa fila (o con su excepción, p. ej. un `UNIQUE(name)` violado)
+    después del commit del grupo. Un grupo se cierra al llegar a `max_batch`
+    filas o cuando pasan `max_delay` segundos desde la primera.
+    """
+
+    def __init__(self, max_delay: float = MAX_DELAY, max_batch: int = MAX_BATCH) -> None:
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Procesa lo que quede en la cola y detiene el hilo."""
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def submit(self, name: str, description: Optional[str] = None) -> "Future[int]":
+        future: "Future[int]" = Future()
+        self._queue.put((name, description, future))
+        return future
+
+    def _collect(self, first: _Pending) -> Tuple[List[_Pending], bool]:
+        """Reúne un grupo a partir de la primera fila; indica si llegó la señal de parada."""
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                return batch, True
+            batch.append(entry)
+        return batch, False
+
+    def _commit(self, batch: List[_Pending]) -> None:
+        # Las filas cuyo Future ya se canceló no se insertan; las demás pasan a
+        # RUNNING y ya no pueden cancelarse, así resolverlas nunca falla
+        batch = [entry for entry in batch if entry[2].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        # Con almacenamiento particionado cada shard confirma su parte del grupo
+        by_shard: Dict[int, List[_Pending]] = {}
+        for entry in batch:
+            by_shard.setdefault(database.shard_for(entry[0]), []).append(entry)
+        for shard, rows in by_shard.items():
+            self._commit_shard(shard, rows)
+        logger.debug("Grupo confirmado: %d filas", len(batch))
+
+    def _commit_shard(self, shard: int, batch: List[_Pending]) -> None:
+        results: List[Tuple["Future[int]", Optional[int], Optional[Exception]]] = []
+        try:
+            with database.get_conn(shard) as conn:
+                for name, description, future in batch:
+                    try:
+                        cursor = conn.execute(
+                            "INSERT INTO items (name, description) VALUES (?, ?)",
+                            (name, description),
+                        )
+                        results.append((future, database.global_id(cursor.lastrowid, shard), None))
+                    except sqlite3.IntegrityError as exc:
+                        # SQLite deshace solo la sentencia fallida; el resto del grupo sigue
+                        results.append((future, None, exc))
+                conn.commit()
+        except Exception as exc:
+            logger.exception("Falló el commit de un grupo de %d filas", len(batch))
+            _fail(batch, exc)
+            return
+
+        # Los Futures se resuelven después del commit: el id devuelto ya es durable
+        for future, item_id, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(item_id)
+        # Un aviso fallido no convierte en error filas ya confirmadas
+        try:
+            database.notify_write()
+        except Exception:
+            logger.exception("Falló el aviso de escritura tras un commit")
+
+    def _run(self) -> None:
+        while True:
+            entry = self._queue.get()
+            if entry is _STOP:
+                return
+            batch, stopping = self._collect(entry)
+            try:
+                self._commit(batch)
+            except Exception as exc:
+                # Solo falla este grupo; el hilo sigue atendiendo la cola
+                logger.exception("Error inesperado del escritor con un grupo de %d filas", len(batch))
+                _fail(batch, exc)
+            if stopping:
+                return
+
+
+_writer: Optional[GroupCommitWriter] = None
+_writer_lock = threading.Lock()
+
+
+def start_writer() -> None:
+    """
+    Arranca el escritor global si no está en marcha.
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = GroupCommitWriter()
+            _writer.start()
+            logger.info(
+                "Escritor con group commit activo (máx. %d filas / %.1f ms)",
+                MAX_BATCH,
+                MAX_DELAY * 1000,
+            )
+
+
+def stop_writer() -> None:
+    """
+    Vacía la cola pendiente y detiene el escritor global.
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.stop()
+            _writer = None
+            logger.info("Escritor con group commit detenido")
+
+
+def submit(name: str, description: Optional[str] = None) -> Optional["Future[int]"]:
+    """
+    Encola una inserción en el escritor global.
+
+    :return: Future con el id del ítem, o None si el escritor no está activo.
+    """
+    writer = _writer
+    if writer is None:
+        return None
+    return writer.submit(name, description)
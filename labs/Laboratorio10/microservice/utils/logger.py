@@ -1,28 +1,122 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
 import sys
+import threading
+import time
+from typing import Any, Dict, Tuple
+
+from microservice.utils.config import settings
+
+# Máximo de mensajes por segundo para cada plantilla de mensaje (niveles < WARNING)
+SAMPLE_PER_SECOND = int(os.getenv("LOG_SAMPLE_PER_SECOND", "50"))
+
+# Atributos estándar de LogRecord que no se copian como campos extra
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formatea cada registro como una línea JSON con timestamp, nivel, logger,
+    mensaje y cualquier campo pasado en `extra=`.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": "%s.%03d" % (self.formatTime(record, "%Y-%m-%dT%H:%M:%S"), record.msecs),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RateSamplingFilter(logging.Filter):
+    """
+    Limita cada tipo de mensaje (logger + plantilla sin formatear) a
+    `per_second` registros por segundo. WARNING y superiores nunca se descartan.
+    El siguiente registro emitido lleva `sampled_out` con los descartados.
+    """
+
+    def __init__(self, per_second: int = SAMPLE_PER_SECOND) -> None:
+        super().__init__()
+        self.per_second = per_second
+        self._windows: Dict[Tuple[str, str], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.per_second <= 0:
+            return True
+        key = (record.name, str(record.msg))
+        now = int(time.monotonic())
+        with self._lock:
+            # [segundo actual, emitidos en ese segundo, descartados pendientes]
+            window = self._windows.setdefault(key, [now, 0, 0])
+            if window[0] != now:
+                window[0], window[1] = now, 0
+            if window[1] >= self.per_second:
+                window[2] += 1
+                return False
+            window[1] += 1
+            if window[2]:
+                record.sampled_out = window[2]
+                window[2] = 0
+        return True
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que en el hilo que registra solo interpola el mensaje;
+    el formateo JSON y la escritura ocurren en el hilo del listener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
 
 def _configurar_logger() -> logging.Logger:
     """
     Configura y retorna un logger con nombre 'microservice'.
-    - Nivel INFO por defecto.
-    - Salida a stdout.
-    - Formato: timestamp - nivel - logger - mensaje.
+    - Nivel INFO por defecto (DEBUG si DEBUG=1).
+    - Registros en JSON a stdout, escritos por un hilo aparte (QueueHandler):
+      quien registra no espera por la E/S.
+    - Muestreo por tipo de mensaje para los niveles por debajo de WARNING.
     """
     logger = logging.getLogger("microservice")
 
     # Si aún no tiene handlers, configuramos uno nuevo
     if not logger.handlers:
-        logger.setLevel(logging.INFO)
+        logger.setLevel(logging.DEBUG if settings()["DEBUG"] else logging.INFO)
 
-        # Handler para enviar logs a la salida estándar
-        handler = logging.StreamHandler(sys.stdout)
+        # Handler real: JSON a la salida estándar, atendido por el listener
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(JsonFormatter())
 
-        # Formato de los mensajes de log
-        formato = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
-        formatter = logging.Formatter(formato)
-        handler.setFormatter(formatter)
+        log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        queue_handler = _DeferredQueueHandler(log_queue)
+        queue_handler.addFilter(RateSamplingFilter())
+        logger.addHandler(queue_handler)
 
-        logger.addHandler(handler)
+        listener = logging.handlers.QueueListener(log_queue, stream_handler)
+        listener.start()
+        # Al salir del proceso se vacía la cola antes de terminar
+        atexit.register(listener.stop)
 
     return logger
 
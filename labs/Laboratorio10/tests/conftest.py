@@ -1,8 +1,47 @@
 # tests/conftest.py
 
+import os
 import sys
 from pathlib import Path
 
 # Inserta la carpeta raíz (donde está microservice/) al path de importación
 root = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(root))
+
+# Evita que las pruebas escriban en el app.db versionado: toda la suite usa
+# una base en memoria compartida (se lee al importar microservice.services.database)
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+import pytest
+
+from microservice.services import database
+
+
+@pytest.fixture(scope="session", autouse=True)
+def isolated_db():
+    """
+    Cierra el pool al terminar la sesión (la base en memoria desaparece con él).
+    """
+    yield database.DB_PATH
+    database.close_pool()
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Apunta la capa de datos a un archivo temporal y cierra el pool al terminar."""
+    database.close_pool()
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "test.db")
+    database.init_db()
+    yield database
+    database.close_pool()
+
+
+@pytest.fixture
+def sharded_db(tmp_path, monkeypatch):
+    """Como `db`, pero repartido en tres archivos SQLite."""
+    database.close_pool()
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "test.db")
+    monkeypatch.setattr(database, "SHARDS", 3)
+    database.init_db()
+    yield database
+    database.close_pool()
@@ -6,6 +6,7 @@ Se asume que la lógica de negocio está en microservice/main.py y que FastAPI r
 import pytest
 from fastapi.testclient import TestClient
 from microservice.main import app
+from microservice.services import business_logic
 
 # Fixtures
 
@@ -46,3 +47,106 @@ def test_create_item_and_verify_in_list(client):
     assert any(i["name"] == ITEM_NAME for i in items), (
         f"El ítem '{ITEM_NAME}' debería figurar en la lista"
     )
+
+def test_list_items_pagination(client):
+    """El listado respeta `limit` e indica el cursor de la siguiente página."""
+    for i in range(3):
+        client.post("/api/items", json={"name": f"page-{i}"})
+
+    resp = client.get("/api/items", params={"limit": 2, "name": "page-"})
+    assert resp.status_code == 200
+    assert [i["name"] for i in resp.json()] == ["page-0", "page-1"]
+
+    next_resp = client.get(
+        "/api/items",
+        params={"limit": 2, "name": "page-", "after_id": resp.headers["X-Next-After-Id"]},
+    )
+    assert [i["name"] for i in next_resp.json()] == ["page-2"]
+    assert "X-Next-After-Id" not in next_resp.headers
+
+def test_bulk_create_reports_conflicts(client):
+    """La carga masiva inserta lo posible e informa los conflictos por fila."""
+    client.post("/api/items", json={"name": "bulk-existing"})
+    payload = [
+        {"name": "bulk-a", "description": "A"},
+        {"name": "bulk-existing"},
+        {"name": "bulk-b"},
+        {"name": "bulk-a"},
+    ]
+    resp = client.post("/api/items/bulk", json=payload)
+    assert resp.status_code == 200
+
+    body = resp.json()
+    assert [i["name"] for i in body["created"]] == ["bulk-a", "bulk-b"]
+    assert [(c["index"], c["name"]) for c in body["conflicts"]] == [
+        (1, "bulk-existing"),
+        (3, "bulk-a"),
+    ]
+
+    names = [i["name"] for i in client.get("/api/items", params={"name": "bulk-"}).json()]
+    assert names == ["bulk-existing", "bulk-a", "bulk-b"]
+
+def test_list_items_etag_and_invalidation(client):
+    """El listado devuelve ETag, responde 304 si no cambió y se invalida al escribir."""
+    first = client.get("/api/items", params={"name": "etag-"})
+    etag = first.headers["ETag"]
+
+    cached = client.get("/api/items", params={"name": "etag-"}, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+
+    client.post("/api/items", json={"name": "etag-new"})
+    fresh = client.get("/api/items", params={"name": "etag-"}, headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["ETag"] != etag
+    assert [i["name"] for i in fresh.json()] == ["etag-new"]
+
+def test_search_items_ranked(client):
+    """La búsqueda encuentra por nombre o descripción y prioriza el nombre."""
+    client.post("/api/items", json={"name": "lámpara de mesa", "description": "luz cálida"})
+    client.post("/api/items", json={"name": "escritorio", "description": "incluye lampara"})
+
+    resp = client.get("/api/items/search", params={"q": "lampara"})
+    assert resp.status_code == 200
+    assert [i["name"] for i in resp.json()] == ["lámpara de mesa", "escritorio"]
+
+    resp = client.get("/api/items/search", params={"q": "lamp calid", "limit": 1})
+    assert [i["name"] for i in resp.json()] == ["lámpara de mesa"]
+
+def test_idempotency_key_replays_first_response(client):
+    """Reintentar con la misma Idempotency-Key devuelve la primera respuesta sin duplicar."""
+    headers = {"Idempotency-Key": "retry-1"}
+    payload = {"name": "idem-item"}
+
+    first = client.post("/api/items", json=payload, headers=headers)
+    retry = client.post("/api/items", json=payload, headers=headers)
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+
+    other_body = client.post("/api/items", json={"name": "otro"}, headers=headers)
+    assert other_body.status_code == 422
+
+    # Un 400 por nombre duplicado también se recuerda para esa clave
+    conflict = client.post("/api/items", json=payload, headers={"Idempotency-Key": "retry-2"})
+    replay = client.post("/api/items", json=payload, headers={"Idempotency-Key": "retry-2"})
+    assert conflict.status_code == replay.status_code == 400
+    assert replay.json() == conflict.json()
+
+
+def test_idempotency_key_does_not_store_transient_errors(client, monkeypatch):
+    """Un timeout no se guarda para la clave: el reintento vuelve a escribir."""
+    create = business_logic.create_item_async
+    calls = []
+
+    async def flaky(name, description=None):
+        calls.append(name)
+        if len(calls) == 1:
+            raise TimeoutError()
+        return await create(name, description)
+
+    monkeypatch.setattr(business_logic, "create_item_async", flaky)
+    headers = {"Idempotency-Key": "retry-timeout"}
+    first = client.post("/api/items", json={"name": "idem-timeout"}, headers=headers)
+    retry = client.post("/api/items", json={"name": "idem-timeout"}, headers=headers)
+    assert (first.status_code, retry.status_code) == (400, 201)
+    assert "Idempotent-Replayed" not in retry.headers
@@ -0,0 +1,263 @@
+"""
+Pruebas unitarias de la capa de acceso a SQLite.
+Cada prueba usa una base de datos temporal y un pool propio.
+"""
+
+import asyncio
+import json
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from microservice.services import business_logic, database, idempotency
+from microservice.services.write_queue import GroupCommitWriter
+
+
+def test_connections_are_reused(db):
+    """Dos operaciones consecutivas deberían reutilizar la misma conexión."""
+    with db.get_conn() as first:
+        pass
+    with db.get_conn() as second:
+        pass
+    assert first is second
+
+
+def test_connection_pragmas(db):
+    """Las conexiones del pool se abren en modo WAL con synchronous=NORMAL."""
+    with db.get_conn() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+
+
+def test_failed_insert_does_not_leave_open_transaction(db):
+    """Un INSERT duplicado se deshace y la conexión sigue siendo utilizable."""
+    db.add_item("dup")
+    with pytest.raises(Exception):
+        db.add_item("dup")
+    with db.get_conn() as conn:
+        assert not conn.in_transaction
+    assert [i["name"] for i in db.list_items()] == ["dup"]
+
+
+def test_keyset_pagination_and_filters(db):
+    """Las páginas se encadenan por id y los filtros usan rangos indexados."""
+    for name in ["apple", "apricot", "banana", "blueberry", "cherry"]:
+        db.add_item(name)
+
+    first = db.list_items(limit=2)
+    second = db.list_items(limit=2, after_id=first[-1]["id"])
+    assert [i["name"] for i in first + second] == ["apple", "apricot", "banana", "blueberry"]
+
+    assert [i["name"] for i in db.list_items(name_prefix="b")] == ["banana", "blueberry"]
+    # U+10FFFF no tiene sucesor: sin cota superior (o con la del carácter anterior)
+    db.add_item("\U0010ffff\U0010ffffz")
+    assert [i["name"] for i in db.list_items(name_prefix="\U0010ffff")] == ["\U0010ffff\U0010ffffz"]
+    assert db.list_items(name_prefix="a\U0010ffff") == []
+
+    with db.get_conn() as conn:
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM items WHERE created_at >= ?", ("2000-01-01",)
+        ).fetchall()
+    assert any("idx_items_created_at" in row[-1] for row in plan)
+
+
+def test_group_commit_writer_resolves_each_row(db):
+    """El escritor agrupa inserciones concurrentes y cada Future recibe su propio id."""
+    writer = GroupCommitWriter(max_delay=0.05, max_batch=64)
+    writer.start()
+    try:
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            futures = list(pool.map(lambda i: writer.submit(f"gc-{i}"), range(50)))
+        duplicate = writer.submit("gc-0")
+        ids = [f.result(timeout=5) for f in futures]
+        with pytest.raises(Exception):
+            duplicate.result(timeout=5)
+    finally:
+        writer.stop()
+
+    assert len(set(ids)) == 50
+    stored = {i["name"]: i["id"] for i in db.list_items()}
+    assert all(stored[f"gc-{i}"] == item_id for i, item_id in enumerate(ids))
+
+
+def test_group_commit_writer_skips_cancelled_rows(db):
+    """Un Future cancelado antes del commit no se inserta ni detiene al escritor."""
+    writer = GroupCommitWriter(max_delay=0.05)
+    cancelled = writer.submit("gc-cancelled")
+    assert cancelled.cancel()
+    kept = writer.submit("gc-kept")
+    writer.start()
+    try:
+        assert kept.result(timeout=5)
+        assert writer.submit("gc-after").result(timeout=5)
+        assert writer._thread.is_alive()
+    finally:
+        writer.stop()
+
+    assert sorted(i["name"] for i in db.list_items()) == ["gc-after", "gc-kept"]
+
+
+def test_group_commit_writer_survives_unexpected_errors(db, monkeypatch):
+    """Un error inesperado solo falla su grupo y un aviso fallido no afecta a filas confirmadas."""
+    shard_for = db.shard_for
+    monkeypatch.setattr(db, "shard_for", lambda name: 1 / 0 if name == "boom" else shard_for(name))
+    monkeypatch.setattr(db, "notify_write", lambda: 1 / 0)
+    writer = GroupCommitWriter(max_delay=0)
+    writer.start()
+    try:
+        with pytest.raises(ZeroDivisionError):
+            writer.submit("boom").result(timeout=5)
+        assert writer.submit("ok").result(timeout=5)
+    finally:
+        writer.stop()
+
+    assert [i["name"] for i in db.list_items()] == ["ok"]
+
+
+def test_page_cache_sees_writes_from_other_connections(db):
+    """La caché del listado se invalida con escrituras ajenas (otro worker o proceso)."""
+    business_logic.invalidate_cache()
+    db.add_item("propio")
+    first = business_logic.get_items_page(limit=10)
+    assert business_logic.get_items_page(limit=10) is first
+
+    with sqlite3.connect(db.DB_PATH) as other:
+        other.execute("INSERT INTO items (name) VALUES ('externo')")
+    page = business_logic.get_items_page(limit=10)
+    assert page.etag != first.etag
+    assert [i["name"] for i in json.loads(page.body)] == ["propio", "externo"]
+
+
+def test_list_items_json_matches_list_items(db):
+    """El JSON generado por SQLite equivale al listado con los campos públicos."""
+    db.add_item("ñandú", "con acento")
+    db.add_item("sin-descripcion")
+
+    body, count, last_id = db.list_items_json(limit=10)
+    expected = [
+        {"id": i["id"], "name": i["name"], "description": i["description"]}
+        for i in db.list_items(limit=10)
+    ]
+    assert json.loads(body) == expected
+    assert count == 2 and last_id == expected[-1]["id"]
+    assert db.list_items_json(after_id=last_id) == (b"[]", 0, None)
+
+
+def test_search_index_follows_updates_and_deletes(db):
+    """Los triggers mantienen el índice FTS5 sincronizado con `items`."""
+    item_id = db.add_item("tornillo", "acero")
+    with db.get_conn() as conn:
+        conn.execute("UPDATE items SET description = 'bronce' WHERE id = ?", (item_id,))
+        conn.commit()
+    assert db.search_items("acero") == []
+    assert [i["id"] for i in db.search_items("bronce")] == [item_id]
+
+    with db.get_conn() as conn:
+        conn.execute("DELETE FROM items WHERE id = ?", (item_id,))
+        conn.commit()
+    assert db.search_items("tornillo") == []
+    assert db.search_items('"') == []
+
+
+def test_idempotency_store_survives_memory_eviction(db, monkeypatch):
+    """Con persistencia activada, una clave expulsada de memoria se recupera de SQLite."""
+    monkeypatch.setattr(idempotency, "PERSIST", True)
+    idempotency.init_store()
+    asyncio.run(idempotency.remember("k", "fp", 201, b'{"id":1}'))
+    idempotency._cache.clear()
+
+    stored = asyncio.run(idempotency.lookup("k"))
+    assert (stored.fingerprint, stored.status_code, stored.body) == ("fp", 201, b'{"id":1}')
+
+
+def test_read_replica_serves_reads_after_refresh(db, monkeypatch):
+    """Con la réplica activa, las lecturas ven las escrituras tras el refresco."""
+    refreshed = []
+    monkeypatch.setattr(db, "READ_REPLICA", True)
+    db.add_item("antes", "ya copiado")
+    db.start_replica(listeners=[lambda: refreshed.append(True)])
+    try:
+        assert [i["name"] for i in db.list_items()] == ["antes"]
+        assert [i["name"] for i in db.search_items("copiado")] == ["antes"]
+
+        db._replica.refresh_seconds = 60  # solo refrescos por escritura
+        db.add_item("despues")
+        for _ in range(100):
+            if len(refreshed) > 1:
+                break
+            time.sleep(0.02)
+        assert [i["name"] for i in db.list_items()] == ["antes", "despues"]
+    finally:
+        db.stop_replica()
+
+
+def test_read_replica_refreshes_only_on_changes(db):
+    """Sin escrituras no se copia nada; una escritura de otra conexión sí refresca."""
+    refreshed = []
+    replica = db.ReadReplica(refresh_seconds=0.01)
+    replica.listeners.append(lambda: refreshed.append(True))
+    replica.start()
+    try:
+        time.sleep(0.1)
+        assert refreshed == [True]
+
+        with sqlite3.connect(db.DB_PATH) as other:  # sin notify_write
+            other.execute("INSERT INTO items (name) VALUES ('externo')")
+        for _ in range(100):
+            if len(refreshed) > 1:
+                break
+            time.sleep(0.02)
+        with replica.connection() as first, replica.connection() as second:
+            assert first is not second
+            assert first.execute("SELECT name FROM items").fetchall() == [("externo",)]
+    finally:
+        replica.stop()
+
+
+def test_parse_database_url():
+    """DATABASE_URL admite rutas relativas y absolutas, memoria compartida y shards."""
+    assert database.parse_database_url("sqlite:///./app.db") == (Path("app.db"), 1)
+    assert database.parse_database_url("sqlite:////data/app.db?shards=4") == (Path("/data/app.db"), 4)
+    target, shards = database.parse_database_url("sqlite:///:memory:")
+    assert target.startswith("file:") and "mode=memory" in target and shards == 1
+    with pytest.raises(ValueError):
+        database.parse_database_url("postgresql://localhost/app")
+
+
+def test_sharded_storage_merges_reads(sharded_db, tmp_path):
+    """Los ítems se reparten por nombre y las lecturas recorren todos los shards en orden."""
+    db = sharded_db
+    names = [f"item-{i:02d}" for i in range(30)]
+    ids = [db.add_item(name, "tuerca") for name in names[:10]]
+    created, conflicts = db.add_items([(name, "tuerca") for name in names[10:20]] + [("item-00", None)])
+    ids += [item["id"] for item in created]
+    assert [c["name"] for c in conflicts] == ["item-00"]
+    writer = GroupCommitWriter()
+    writer.start()
+    try:
+        ids += [f.result(timeout=5) for f in [writer.submit(name, "tuerca") for name in names[20:]]]
+    finally:
+        writer.stop()
+
+    assert sorted(p.name for p in tmp_path.glob("test.shard*.db")) == [
+        "test.shard0.db", "test.shard1.db", "test.shard2.db"
+    ]
+    assert len(set(ids)) == 30 and {i % 3 for i in ids} == {0, 1, 2}
+    assert all(i % 3 == db.shard_for(name) for i, name in zip(ids, names))
+
+    pages, after_id = [], None
+    while True:
+        page = db.list_items(limit=7, after_id=after_id)
+        if not page:
+            break
+        pages.extend(page)
+        after_id = page[-1]["id"]
+    assert [i["id"] for i in pages] == sorted(ids)
+
+    body, count, last_id = db.list_items_json(limit=5)
+    assert count == 5 and last_id == sorted(ids)[4]
+    assert len(db.search_items("tuerca", limit=50)) == 30
+    assert len(db.search_items("tuerca", limit=10, offset=25)) == 5
@@ -0,0 +1,44 @@
+"""
+Pruebas del logger estructurado: formato JSON y muestreo por tipo de mensaje.
+"""
+
+import json
+import logging
+
+from microservice.utils import logger as logger_module
+from microservice.utils.logger import JsonFormatter, RateSamplingFilter
+
+
+def _record(msg, level=logging.INFO, args=(), **extra):
+    record = logging.makeLogRecord(
+        {"name": "microservice", "levelno": level, "levelname": logging.getLevelName(level),
+         "msg": msg, "args": args}
+    )
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_includes_extra_fields():
+    line = JsonFormatter().format(_record("Ítem creado %s", args=("x",), item_id=7))
+    entry = json.loads(line)
+    assert entry["msg"] == "Ítem creado x"
+    assert entry["level"] == "INFO"
+    assert entry["item_id"] == 7
+
+
+def test_sampling_limits_each_message_type_and_reports_dropped(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(logger_module.time, "monotonic", lambda: clock[0])
+    sampler = RateSamplingFilter(per_second=3)
+    kept = [sampler.filter(_record("insert")) for _ in range(10)]
+    assert kept.count(True) == 3
+
+    clock[0] += 1
+    record = _record("insert")
+    assert sampler.filter(record)
+    assert record.sampled_out == 7
+
+    # Otra plantilla tiene su propio cupo y los WARNING siempre pasan
+    assert sampler.filter(_record("other"))
+    assert all(sampler.filter(_record("insert", level=logging.WARNING)) for _ in range(5))
+
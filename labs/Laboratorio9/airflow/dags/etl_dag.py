@@ -1,18 +1,37 @@
 """
-DAG simple que ejecuta el pipeline ETL dentro del contenedor Airflow.
+DAG que ejecuta el pipeline ETL dentro del contenedor Airflow.
 
 En entorno real usaríamos KubernetesPodOperator / DockerOperator / etc.
-Aquí hacemos un PythonOperator directo para demostrar idea.
+Aquí usamos tareas Python directas para demostrar idea.
+
+Cada partición de ETL_INPUT (ver pipeline.discover_inputs) es una instancia
+de `load_partition` creada con dynamic task mapping:
+- como mucho ETL_LOADERS particiones se cargan a la vez (1 con SQLite);
+- una partición fallida se reintenta sola, sin reprocesar las demás (cada
+  partición se carga en una única transacción);
+- `reconcile` comprueba al final los conteos de filas de todas.
+
+El informe de cada partición queda en el XCom de su instancia mapeada; el
+resumen de `reconcile` en su `return_value` (y en ETL_REPORT, si está
+definido) y cada etapa además en su propio XCom (`stage_extract`,
+`stage_transform`, `stage_load`) para comparar ejecuciones desde la UI.
 """
 
-from datetime import datetime
-from airflow import DAG
-from airflow.operators.python import PythonOperator
+import os
 import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from airflow import DAG
+from airflow.decorators import task
 
 # Aseguramos que Airflow vea el código del ETL
 sys.path.append("/opt/airflow/app")
-from pipeline import run_etl  # noqa: E402
+import pipeline  # noqa: E402
+from metrics import write_report  # noqa: E402
+
+# Particiones cargándose a la vez (instancias activas de load_partition)
+MAX_ACTIVE_PARTITIONS = pipeline.max_loaders(int(os.environ.get("ETL_LOADERS", "2")))
 
 
 with DAG(
@@ -23,7 +42,29 @@ with DAG(
     default_args={"owner": "devsecops"},
     tags=["devsecops", "etl"],
 ):
-    run_etl_task = PythonOperator(
-        task_id="run_etl",
-        python_callable=run_etl,
+
+    @task
+    def discover_partitions() -> List[str]:
+        paths = pipeline.discover_inputs()
+        if not paths:
+            raise FileNotFoundError(f"ETL_INPUT no contiene archivos: {os.environ.get('ETL_INPUT')!r}")
+        pipeline.prepare_sink()
+        return paths
+
+    @task(
+        max_active_tis_per_dag=MAX_ACTIVE_PARTITIONS,
+        retries=2,
+        retry_delay=timedelta(minutes=1),
     )
+    def load_partition(path: str) -> Dict[str, Any]:
+        return pipeline.run_partition(path)
+
+    @task
+    def reconcile(reports, ti=None) -> Dict[str, Any]:
+        summary = pipeline.reconcile(list(reports))
+        for stage, stats in summary["stages"].items():
+            ti.xcom_push(key=f"stage_{stage}", value=stats)
+        write_report(summary)
+        return summary
+
+    reconcile(load_partition.expand(path=discover_partitions()))
@@ -0,0 +1,111 @@
+"""
+Generador de CSV sintéticos `name,value` para medir el ETL.
+
+Cada bloque de BLOCK_ROWS filas se arma como una matriz de bytes de ancho
+fijo con NumPy (dígitos calculados con aritmética entera, sin formatear
+strings fila a fila): unos segundos por cada 10^7 filas y memoria acotada
+por el bloque, también para 10^8.
+
+- name: `n` + NAME_DIGITS dígitos; único por fila o, con --cardinality K,
+  uno de K valores (para probar `name` categórico).
+- value: normal(0, VALUE_SCALE) con VALUE_DECIMALS decimales.
+
+Reproducible: cada bloque usa sus propios generadores derivados de (seed,
+índice de bloque), uno para `name` y otro para `value`, así que con la misma
+semilla (y la misma --cardinality) un archivo de N filas es prefijo del de
+M > N filas.
+
+Uso (desde labs/Laboratorio9/app):
+    python -m benchmarks.generate --rows 1000000 --seed 7 bench-data/rows-1000000.csv
+"""
+
+import argparse
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+BLOCK_ROWS = 1_000_000
+NAME_DIGITS = 9
+VALUE_SCALE = 1000.0
+VALUE_INT_DIGITS = 5  # |value| < 10^5 (se recorta en el extremo)
+VALUE_DECIMALS = 3
+
+HEADER = b"name,value\n"
+
+
+def _digits(numbers: np.ndarray, width: int) -> np.ndarray:
+    """Matriz (n, width) con los dígitos ASCII de enteros no negativos, con ceros a la izquierda."""
+    powers = 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    return (numbers[:, None] // powers % 10 + ord("0")).astype(np.uint8)
+
+
+def _column(char: bytes, rows: int) -> np.ndarray:
+    return np.full((rows, 1), ord(char), dtype=np.uint8)
+
+
+def block(index: int, rows: int, seed: int = 0, cardinality: Optional[int] = None) -> bytes:
+    """Las `rows` primeras filas del bloque `index`, como bytes CSV sin cabecera."""
+    # Un generador para los nombres y otro para los valores: así las primeras
+    # filas del bloque no dependen de cuántas se piden
+    if cardinality:
+        ids = np.random.default_rng([seed, index, 0]).integers(0, cardinality, rows)
+    else:
+        ids = np.arange(index * BLOCK_ROWS, index * BLOCK_ROWS + rows, dtype=np.int64)
+    values = np.random.default_rng([seed, index, 1]).normal(0.0, VALUE_SCALE, rows)
+
+    scale = 10**VALUE_DECIMALS
+    fixed = np.minimum(np.rint(np.abs(values) * scale).astype(np.int64), 10 ** (VALUE_INT_DIGITS + VALUE_DECIMALS) - 1)
+    sign = np.where(values < 0, ord("-"), ord("+")).astype(np.uint8)[:, None]
+    matrix = np.hstack([
+        _column(b"n", rows),
+        _digits(ids, NAME_DIGITS),
+        _column(b",", rows),
+        sign,
+        _digits(fixed // scale, VALUE_INT_DIGITS),
+        _column(b".", rows),
+        _digits(fixed % scale, VALUE_DECIMALS),
+        _column(b"\n", rows),
+    ])
+    return matrix.tobytes()
+
+
+def generate(path: str, rows: int, seed: int = 0, cardinality: Optional[int] = None) -> str:
+    """
+    Escribe `rows` filas en `path` (vía un archivo temporal, para no dejar
+    CSV a medias) y devuelve la ruta.
+    """
+    if cardinality is not None and not 0 < cardinality <= 10**NAME_DIGITS:
+        raise ValueError(f"cardinality debe estar entre 1 y 10^{NAME_DIGITS}")
+    if rows > 10**NAME_DIGITS:
+        raise ValueError(f"Como mucho 10^{NAME_DIGITS} filas")
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(target.name + ".tmp")
+    with tmp.open("wb") as fh:
+        fh.write(HEADER)
+        for index, start in enumerate(range(0, rows, BLOCK_ROWS)):
+            fh.write(block(index, min(BLOCK_ROWS, rows - start), seed, cardinality))
+    os.replace(tmp, target)
+    return str(target)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output", help="CSV a escribir")
+    parser.add_argument("--rows", type=lambda v: int(float(v)), default=1_000_000, help="Filas (admite 1e6)")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla")
+    parser.add_argument("--cardinality", type=int, help="Valores distintos de name (por defecto, únicos)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    path = generate(args.output, args.rows, args.seed, args.cardinality)
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(path)
+    print(f"{args.rows} filas ({size / 2**20:.1f} MiB) en {path} en {elapsed:.2f} s ({size / 2**20 / elapsed:.0f} MiB/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Curvas de escalado del ETL: filas/s y pico de memoria por tamaño de entrada.
+
+Para cada tamaño genera (o reutiliza) un CSV sintético con
+benchmarks.generate y ejecuta pipeline.py una vez por combinación de sink y
+modo, cada una en su propio proceso para que el pico de RSS sea el de esa
+ejecución. Los tiempos salen del informe por etapa (ETL_REPORT, ver
+metrics.py). Guarda results.json (con el detalle por etapa) y results.csv
+(una fila por punto de la curva) y marca, por escenario, desde qué tamaño
+las filas/s caen por debajo de la mitad del máximo.
+
+Postgres solo se mide con --postgres (conexión vía POSTGRES_*): vacía
+processed_data y los watermarks de los CSV del benchmark antes de cada carga,
+así que no usarlo contra una base con datos reales.
+
+Uso (desde labs/Laboratorio9/app):
+    python -m benchmarks.scaling --sizes 1e3 1e4 1e5 1e6
+    python -m benchmarks.scaling --sizes 1e7 1e8 --sinks null parquet --chunksize 500000
+    python -m benchmarks.scaling --postgres
+"""
+
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmarks.generate import generate
+
+APP_DIR = Path(__file__).resolve().parent.parent
+
+LOCAL_SCENARIOS = [("null", "full"), ("sqlite", "full"), ("parquet", "full")]
+POSTGRES_SCENARIOS = [("postgres", "full"), ("postgres", "incremental")]
+
+OUTPUT_SUFFIX = {"sqlite": ".db", "parquet": ".parquet"}
+
+# Fracción del máximo de filas/s por debajo de la cual se considera que deja de escalar
+SCALING_THRESHOLD = 0.5
+
+
+def dataset(data_dir: Path, rows: int, seed: int) -> str:
+    """CSV de `rows` filas para `seed`, generado solo si no existe."""
+    path = data_dir / f"rows-{rows}-seed-{seed}.csv"
+    if not path.exists():
+        generate(str(path), rows, seed)
+    return str(path)
+
+
+def reset_postgres(input_path: str) -> None:
+    """
+    Vacía processed_data y el watermark de `input_path`, creando antes el
+    esquema si la base está recién creada.
+    """
+    import db
+    from sinks import IncrementalPostgresSink
+
+    IncrementalPostgresSink(input_path).prepare()
+
+    def reset(conn) -> None:
+        with conn.cursor() as cur:
+            cur.execute("TRUNCATE processed_data")
+            cur.execute("DELETE FROM etl_watermarks WHERE input = %s", (input_path,))
+
+    db.transaction(reset)
+
+
+def run_once(input_path: str, sink: str, mode: str, chunksize: Optional[int], workdir: Path) -> Dict[str, Any]:
+    """Ejecuta pipeline.py en un proceso aparte y devuelve su informe."""
+    report_path = workdir / "report.json"
+    output = workdir / f"processed{OUTPUT_SUFFIX.get(sink, '')}"
+    for stale in (report_path, output):
+        if stale.exists():
+            stale.unlink()
+    if sink == "postgres":
+        reset_postgres(input_path)
+
+    env = dict(os.environ, ETL_INPUT=input_path, ETL_SINK=sink, ETL_MODE=mode,
+               ETL_OUTPUT=str(output), ETL_REPORT=str(report_path))
+    if chunksize is not None:
+        env["ETL_CHUNKSIZE"] = str(chunksize)
+    proc = subprocess.run(
+        [sys.executable, "pipeline.py"], cwd=APP_DIR, env=env, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        lines = proc.stderr.strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else f"pipeline.py terminó con código {proc.returncode}")
+    return json.loads(report_path.read_text(encoding="utf-8"))
+
+
+def point(size: int, sink: str, mode: str, report: Dict[str, Any]) -> Dict[str, Any]:
+    seconds = report["wall_seconds"]
+    return {
+        "size": size,
+        "sink": sink,
+        "mode": mode,
+        "rows": report["rows"],
+        "seconds": seconds,
+        "rows_per_second": report["rows"] / seconds if seconds else 0.0,
+        "peak_rss_mib": report["max_rss_bytes"] / 2**20,
+        **{f"{name}_seconds": stats["wall_seconds"] for name, stats in report["stages"].items()},
+    }
+
+
+def scaling_limit(points: List[Dict[str, Any]]) -> Optional[int]:
+    """Primer tamaño, posterior al de máximo throughput, que cae por debajo del umbral."""
+    ok = [p for p in points if "error" not in p]
+    if not ok:
+        return None
+    best = max(ok, key=lambda p: p["rows_per_second"])
+    for p in ok:
+        if p["size"] > best["size"] and p["rows_per_second"] < SCALING_THRESHOLD * best["rows_per_second"]:
+            return p["size"]
+    return None
+
+
+def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    scenarios: List[Tuple[str, str]] = [s for s in LOCAL_SCENARIOS if s[0] in args.sinks]
+    if args.postgres:
+        scenarios += POSTGRES_SCENARIOS
+    output = Path(args.output)
+    output.mkdir(parents=True, exist_ok=True)
+    data_dir = Path(args.data_dir).resolve()
+
+    points: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            input_path = dataset(data_dir, size, args.seed)
+            for sink, mode in scenarios:
+                try:
+                    report = run_once(input_path, sink, mode, args.chunksize, Path(tmp))
+                    points.append({**point(size, sink, mode, report), "stages": report["stages"]})
+                except Exception as exc:
+                    points.append({"size": size, "sink": sink, "mode": mode, "error": str(exc)})
+                print_point(points[-1])
+
+    (output / "results.json").write_text(
+        json.dumps({"params": vars(args), "results": points}, indent=2), encoding="utf-8"
+    )
+    fields = list(point(0, "", "", {"rows": 0, "wall_seconds": 0, "max_rss_bytes": 0,
+                                    "stages": {s: {"wall_seconds": 0} for s in ("extract", "transform", "load")}}))
+    with (output / "results.csv").open("w", newline="", encoding="utf-8") as fh:
+        writer = csv.DictWriter(fh, fieldnames=fields + ["error"], extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(points)
+    return points
+
+
+def print_point(p: Dict[str, Any]) -> None:
+    scenario = f"{p['sink']}/{p['mode']}"
+    if "error" in p:
+        print(f"{scenario:<22} {p['size']:>11} ERROR: {p['error']}")
+        return
+    print(
+        f"{scenario:<22} {p['size']:>11} {p['seconds']:>9.2f} {p['rows_per_second']:>11.0f} "
+        f"{p['peak_rss_mib']:>9.1f} {p['extract_seconds']:>8.2f} {p['transform_seconds']:>8.2f} {p['load_seconds']:>8.2f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", type=lambda v: int(float(v)),
+                        default=[10**3, 10**4, 10**5, 10**6], help="Filas por ejecución (admite 1e7)")
+    parser.add_argument("--sinks", nargs="+", choices=[s for s, _ in LOCAL_SCENARIOS],
+                        default=[s for s, _ in LOCAL_SCENARIOS], help="Sinks locales a medir")
+    parser.add_argument("--postgres", action="store_true", help="Medir también Postgres (full e incremental)")
+    parser.add_argument("--chunksize", type=int, help="ETL_CHUNKSIZE (por defecto, el del entorno)")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla de los datos sintéticos")
+    parser.add_argument("--data-dir", default="bench-data", help="Directorio de los CSV generados")
+    parser.add_argument("--output", default="bench-results", help="Directorio de resultados")
+    args = parser.parse_args()
+
+    print(f"{'escenario':<22} {'filas':>11} {'s':>9} {'filas/s':>11} {'RSS MiB':>9} "
+          f"{'extract':>8} {'transf.':>8} {'load':>8}")
+    points = run(args)
+    for scenario in dict.fromkeys((p["sink"], p["mode"]) for p in points):
+        limit = scaling_limit([p for p in points if (p["sink"], p["mode"]) == scenario])
+        if limit is not None:
+            print(f"{'/'.join(scenario)}: las filas/s caen por debajo del {SCALING_THRESHOLD:.0%} del máximo desde {limit} filas")
+    print(f"Resultados en {args.output}/")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Acceso a PostgreSQL compartido por el ETL y el healthcheck.
+
+Los parámetros de conexión salen de POSTGRES_* en un solo sitio (config).
+Los errores transitorios (servidor arrancando o reiniciando, red caída,
+demasiadas conexiones, deadlock o fallo de serialización) se reintentan
+con backoff exponencial: ETL_DB_RETRIES intentos, esperando desde
+ETL_DB_RETRY_DELAY segundos y duplicando.
+
+Cada proceso tiene un pool de hasta ETL_DB_POOL_SIZE conexiones (por
+defecto ETL_LOADERS, las cargas que pueden ir a la vez). Una carga toma una
+conexión al abrir el sink y la devuelve al cerrarlo, así se reutiliza entre
+lotes y entre particiones del mismo worker en vez de abrir una por carga.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_UNKNOWN
+
+T = TypeVar("T")
+
+# Segundos máximos para establecer una conexión
+CONNECT_TIMEOUT = 5
+# Tope de la espera entre reintentos (segundos)
+MAX_RETRY_DELAY = 10.0
+# SQLSTATE transitorios además de la clase 08 (conexión): serialización,
+# deadlock, demasiadas conexiones y servidor apagándose o arrancando
+TRANSIENT_CODES = ("40001", "40P01", "53300", "57P01", "57P02", "57P03")
+
+logger = logging.getLogger("etl")
+
+
+def config(connect_timeout: int = CONNECT_TIMEOUT) -> Dict[str, Any]:
+    """Parámetros de psycopg2.connect a partir de POSTGRES_*."""
+    return {
+        "dbname": os.environ["POSTGRES_DB"],
+        "user": os.environ["POSTGRES_USER"],
+        "password": os.environ["POSTGRES_PASSWORD"],
+        "host": os.environ.get("POSTGRES_HOST", "postgres"),
+        "port": os.environ.get("POSTGRES_PORT", "5432"),
+        "connect_timeout": connect_timeout,
+    }
+
+
+def _retries() -> int:
+    return int(os.environ.get("ETL_DB_RETRIES", "5"))
+
+
+def _retry_delay() -> float:
+    return float(os.environ.get("ETL_DB_RETRY_DELAY", "0.5"))
+
+
+def _pool_size() -> int:
+    return int(os.environ.get("ETL_DB_POOL_SIZE", os.environ.get("ETL_LOADERS", "1")))
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Indica si vale la pena reintentar la operación que lanzó `exc`."""
+    code = getattr(exc, "pgcode", None)
+    if code:
+        return code.startswith("08") or code in TRANSIENT_CODES
+    # Sin SQLSTATE: libpq no llegó a conectar o perdió la conexión
+    return isinstance(exc, (psycopg2.OperationalError, psycopg2.InterfaceError))
+
+
+def retry(fn: Callable[[], T], retries: Optional[int] = None, deadline: Optional[float] = None) -> T:
+    """
+    Ejecuta `fn()` reintentando ante errores transitorios con backoff
+    exponencial (con jitter). Con `deadline` (en time.monotonic()) no se
+    programa un reintento que terminaría después.
+    """
+    retries = _retries() if retries is None else retries
+    delay = _retry_delay()
+    attempt = 1
+    while True:
+        try:
+            return fn()
+        except Exception as exc:
+            if attempt >= retries or not is_transient(exc):
+                raise
+            wait = min(delay * 2 ** (attempt - 1), MAX_RETRY_DELAY) * random.uniform(0.5, 1.0)
+            if deadline is not None and time.monotonic() + wait >= deadline:
+                raise
+            logger.warning(
+                "Error transitorio de PostgreSQL (%s); reintento %d de %d en %.1f s",
+                str(exc).strip(), attempt, retries - 1, wait,
+            )
+            time.sleep(wait)
+            attempt += 1
+
+
+def connect(deadline: Optional[float] = None):
+    """
+    Conexión nueva (fuera del pool) con reintentos. Con `deadline` cada
+    intento usa como mucho el tiempo que queda.
+    """
+
+    def attempt():
+        timeout = CONNECT_TIMEOUT
+        if deadline is not None:
+            timeout = max(1, min(CONNECT_TIMEOUT, int(deadline - time.monotonic())))
+        return psycopg2.connect(**config(timeout))
+
+    return retry(attempt, deadline=deadline)
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones de un proceso: hasta `size` conexiones, creadas al
+    pedirlas y reutilizadas después. Si todas están en uso, `acquire` espera.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.pid = os.getpid()
+        self._idle: List[Any] = []
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Toma una conexión (un intento; los llamadores la envuelven en
+        `retry` junto con su primera consulta).
+        """
+        self._slots.acquire()
+        try:
+            return self._checkout()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _checkout(self):
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is not None:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                return conn
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                # El servidor cerró la conexión mientras estaba ociosa
+                conn.close()
+        return psycopg2.connect(**config())
+
+    def release(self, conn) -> None:
+        """Devuelve la conexión deshaciendo lo no confirmado; si quedó rota, la cierra."""
+        try:
+            if conn.closed or conn.info.transaction_status == TRANSACTION_STATUS_UNKNOWN:
+                conn.close()
+                return
+            conn.rollback()
+            with self._lock:
+                self._idle.append(conn)
+        except psycopg2.Error:
+            conn.close()
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        """Cierra las conexiones ociosas."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+# Pools heredados con fork: comparten sockets con el padre, así que el hijo
+# no los usa ni los cierra (cerrarlos terminaría las sesiones del padre)
+_inherited: List[ConnectionPool] = []
+
+
+def get_pool() -> ConnectionPool:
+    """Pool del proceso actual, creado al primer uso."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool.pid != os.getpid():
+            _inherited.append(_pool)
+            _pool = None
+        if _pool is None:
+            _pool = ConnectionPool(_pool_size())
+        return _pool
+
+
+def close_pool() -> None:
+    """Cierra las conexiones ociosas del pool (p. ej. antes de lanzar workers)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool.pid == os.getpid():
+            _pool.close()
+        _pool = None
+
+
+def transaction(fn: Callable[[Any], T]) -> T:
+    """
+    Ejecuta `fn(conn)` y confirma, con una conexión del pool. Ante un error
+    transitorio repite la transacción entera, así que `fn` debe poder
+    repetirse sin efectos duplicados.
+    """
+    pool = get_pool()
+
+    def attempt() -> T:
+        conn = pool.acquire()
+        try:
+            result = fn(conn)
+            conn.commit()
+            return result
+        finally:
+            pool.release(conn)
+
+    return retry(attempt)
+
+
+@contextmanager
+def connection() -> Iterator[Any]:
+    """Conexión del pool (con reintentos al tomarla) que vuelve al pool al salir."""
+    pool = get_pool()
+    conn = retry(pool.acquire)
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
@@ -1,20 +1,27 @@
+"""
+Healthcheck del contenedor: SELECT 1 contra PostgreSQL con la misma
+configuración que el ETL (ver db.py), reintentando los errores transitorios
+pero sin pasar de HEALTHCHECK_TIMEOUT segundos, por debajo del `timeout`
+del healthcheck en docker-compose.
+"""
+
 import os
-import psycopg2
+import time
+
+import db
 
 def main():
+    deadline = time.monotonic() + float(os.environ.get("HEALTHCHECK_TIMEOUT", "4"))
     try:
-        conn = psycopg2.connect(
-            dbname=os.environ["POSTGRES_DB"],
-            user=os.environ["POSTGRES_USER"],
-            password=os.environ["POSTGRES_PASSWORD"],
-            host=os.environ.get("POSTGRES_HOST", "postgres"),
-            port=os.environ.get("POSTGRES_PORT", "5432"),
-            connect_timeout=3,
-        )
-        cur = conn.cursor()
-        cur.execute("SELECT 1;")
-        cur.fetchone()
-        conn.close()
+        conn = db.connect(deadline=deadline)
+        try:
+            cur = conn.cursor()
+            remaining_ms = max(1, int((deadline - time.monotonic()) * 1000))
+            cur.execute("SET statement_timeout = %s", (remaining_ms,))
+            cur.execute("SELECT 1;")
+            cur.fetchone()
+        finally:
+            conn.close()
         print("healthy")
     except Exception as e:
         print(f"unhealthy: {e}")
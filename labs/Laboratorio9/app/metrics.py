@@ -0,0 +1,195 @@
+"""
+Instrumentación por etapa del ETL.
+
+RunReport acumula, para extract, transform y load: tiempo de pared, tiempo
+de CPU, filas procesadas, filas/s y el pico de memoria residente (RSS)
+alcanzado dentro de la etapa. En Linux el pico se mide con VmHWM, que se
+reinicia (/proc/self/clear_refs) en cada cambio de etapa; donde no se puede
+reiniciar, se usa el RSS al terminar cada tramo. En modo streaming las etapas
+se intercalan bloque a bloque; las etapas se anidan en una pila y el tiempo
+que pasa en una etapa interior (p. ej. extract pedido desde load) no se
+cuenta en la exterior.
+"""
+
+import json
+import os
+import resource
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+STAGES = ("extract", "transform", "load")
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss() -> int:
+    """RSS actual del proceso en bytes (pico histórico si no hay /proc)."""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        return max_rss()
+
+
+def max_rss() -> int:
+    """
+    Pico de RSS del proceso en bytes. Usa VmHWM de /proc, que empieza de cero
+    en cada exec; ru_maxrss arrastra el pico del proceso padre cuando el
+    ETL se lanza con fork + exec (Linux lo informa en KiB).
+    """
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def reset_peak_rss() -> bool:
+    """
+    Reinicia VmHWM al RSS actual (Linux >= 4.0) para medir el pico de un
+    tramo. Devuelve False si no se puede.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _stage_dict(wall: float, cpu: float, rows: int, peak_rss: int) -> Dict[str, Any]:
+    return {
+        "wall_seconds": wall,
+        "cpu_seconds": cpu,
+        "rows": rows,
+        "rows_per_second": rows / wall if wall else 0.0,
+        "peak_rss_bytes": peak_rss,
+    }
+
+
+class RunReport:
+    """
+    Métricas de una ejecución (o de una partición) del ETL.
+    """
+
+    def __init__(self, **info: Any) -> None:
+        self.info: Dict[str, Any] = dict(info)
+        self.started_at = datetime.now(timezone.utc)
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+        self._totals = {stage: [0.0, 0.0, 0, 0] for stage in STAGES}  # wall, cpu, rows, rss
+        # Etapas abiertas: [nombre, inicio de pared, inicio de CPU]
+        self._stack: List[List[Any]] = []
+        # Pico del proceso: reiniciar VmHWM lo pierde, así que se acumula aquí
+        self._max_rss = max_rss()
+        self._hwm = reset_peak_rss()
+
+    def _checkpoint_rss(self) -> None:
+        """
+        Atribuye el pico desde el último cambio de etapa a la etapa en curso
+        (si la hay) y reinicia la marca para el siguiente tramo.
+        """
+        if not self._hwm:
+            return
+        peak = max_rss()
+        self._max_rss = max(self._max_rss, peak)
+        if self._stack:
+            totals = self._totals[self._stack[-1][0]]
+            totals[3] = max(totals[3], peak)
+        reset_peak_rss()
+
+    def _pause_top(self) -> None:
+        if self._stack:
+            name, wall, cpu = self._stack[-1]
+            totals = self._totals[name]
+            totals[0] += time.perf_counter() - wall
+            totals[1] += time.process_time() - cpu
+
+    def _resume_top(self) -> None:
+        if self._stack:
+            self._stack[-1][1:] = [time.perf_counter(), time.process_time()]
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Mide un tramo de la etapa `name` (sin contar etapas anidadas)."""
+        self._pause_top()
+        self._checkpoint_rss()
+        self._stack.append([name, time.perf_counter(), time.process_time()])
+        try:
+            yield
+        finally:
+            self._pause_top()
+            self._checkpoint_rss()
+            self._stack.pop()
+            if not self._hwm:
+                totals = self._totals[name]
+                totals[3] = max(totals[3], current_rss())
+            self._resume_top()
+
+    def add_rows(self, name: str, rows: int) -> None:
+        self._totals[name][2] += rows
+
+    def iterate(self, name: str, frames: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """Recorre un iterador de DataFrames midiendo cada `next()` como etapa `name`."""
+        frames = iter(frames)
+        while True:
+            with self.stage(name):
+                frame = next(frames, None)
+            if frame is None:
+                return
+            self.add_rows(name, len(frame))
+            yield frame
+
+    def apply(self, name: str, fn: Callable[[pd.DataFrame], pd.DataFrame], frame: pd.DataFrame) -> pd.DataFrame:
+        """Aplica `fn` al DataFrame midiéndolo como etapa `name`."""
+        with self.stage(name):
+            result = fn(frame)
+        self.add_rows(name, len(result))
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        wall = time.perf_counter() - self._start_wall
+        return {
+            **self.info,
+            "started_at": self.started_at.isoformat(),
+            "wall_seconds": wall,
+            "cpu_seconds": time.process_time() - self._start_cpu,
+            "max_rss_bytes": max(self._max_rss, max_rss()),
+            "stages": {name: _stage_dict(*totals) for name, totals in self._totals.items()},
+        }
+
+
+def merge_stages(reports: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Suma las etapas de varias particiones. Los tiempos son segundos-proceso
+    (suma sobre los workers) y el RSS es el máximo de cualquiera de ellos.
+    """
+    merged = {}
+    for name in STAGES:
+        parts = [r["stages"][name] for r in reports]
+        merged[name] = _stage_dict(
+            sum(p["wall_seconds"] for p in parts),
+            sum(p["cpu_seconds"] for p in parts),
+            sum(p["rows"] for p in parts),
+            max((p["peak_rss_bytes"] for p in parts), default=0),
+        )
+    return merged
+
+
+def write_report(report: Dict[str, Any], path: Optional[str] = None) -> Optional[str]:
+    """
+    Guarda el informe como JSON en `path` (o ETL_REPORT). Sin ruta no escribe nada.
+    """
+    path = path or os.environ.get("ETL_REPORT")
+    if not path:
+        return None
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2, default=str)
+    return path
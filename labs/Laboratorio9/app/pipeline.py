@@ -2,69 +2,472 @@
 ETL batch:
 - Extract: lee data/input.csv
 - Transform: calcula value_squared
-- Load: inserta en Postgres (tabla processed_data)
+- Load: inserta en Postgres (tabla processed_data) u otro sink (ver sinks.py)
+
+Por defecto el archivo se procesa en streaming, en bloques de ETL_CHUNKSIZE
+filas: cada bloque se transforma y se carga en cuanto se lee, así la memoria
+queda acotada por el tamaño del bloque y no por el del archivo.
+ETL_CHUNKSIZE=0 vuelve a cargar el CSV completo de una vez.
+
+El destino se elige con ETL_SINK (postgres, sqlite, parquet o null). En
+Postgres la carga usa COPY ... FROM STDIN (ETL_LOAD_METHOD=copy, por
+defecto): cada lote viaja como un único CSV en memoria en vez de una
+sentencia por fila; ETL_LOAD_METHOD=insert fuerza executemany.
+
+ETL_MODE=incremental procesa solo lo añadido a ETL_INPUT desde la última
+ejecución y lo fusiona por posición de fila en la entrada (ver incremental.py);
+solo con ETL_SINK=postgres.
+
+ETL_INPUT también puede ser un directorio (se toman sus *.csv) o un patrón
+glob. Cada archivo es una partición que se procesa en un pool de
+ETL_WORKERS procesos; como mucho ETL_LOADERS cargan a la vez y el resto
+espera con su primer lote ya transformado (backpressure). Al final se
+registra un resumen con filas y tiempos por partición. En Airflow cada
+partición es una tarea mapeada (ver airflow/dags/etl_dag.py) y reconcile
+comprueba al final los conteos de filas.
+
+Cada ejecución mide tiempo de pared, CPU, filas, filas/s y pico de RSS de
+extract, transform y load (ver metrics.py). El informe se registra, se
+guarda como JSON si ETL_REPORT indica una ruta y run_etl_report lo devuelve
+(el DAG de Airflow lo publica como XCom).
+
+Los tipos se fijan al leer (ETL_LEAN_DTYPES=1, por defecto): `name` como
+categoría si tiene pocos valores distintos y `value` reducido al tipo
+numérico más pequeño que lo representa sin pérdida. transform trabaja sobre
+el mismo DataFrame, sin copiarlo.
 
 Cumple 12-Factor: credenciales vienen de variables de entorno,
 NO están hardcodeadas en la imagen ni en el código (más allá de los nombres).
 """
 
+import glob
+import logging
+import multiprocessing
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+from itertools import chain
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
 import pandas as pd
-import psycopg2
-import psycopg2.extras
 
+import db
+import incremental
+from metrics import RunReport, merge_stages, write_report
+from sinks import COLUMNS, IncrementalPostgresSink, Sink, get_sink
+
+# Filas por bloque en modo streaming (0 = leer todo el archivo de una vez)
+DEFAULT_CHUNKSIZE = 100_000
+
+MODES = ("full", "incremental")
+
+# Filas de muestra para decidir el tipo de `name` (y para el informe de memoria)
+DTYPE_SAMPLE_ROWS = 10_000
+# `name` se lee como categoría si sus valores distintos no superan esta fracción
+CATEGORY_MAX_RATIO = 0.5
+
+logger = logging.getLogger("etl")
+
+
+def _input_path() -> str:
+    return os.environ.get("ETL_INPUT", "data/input.csv")
+
+
+def _workers() -> int:
+    return int(os.environ.get("ETL_WORKERS", str(os.cpu_count() or 1)))
+
+
+def _loaders(workers: int) -> int:
+    return int(os.environ.get("ETL_LOADERS", str(workers)))
+
+
+def _chunksize() -> int:
+    return int(os.environ.get("ETL_CHUNKSIZE", str(DEFAULT_CHUNKSIZE)))
 
-def extract():
-    csv_path = os.environ.get("ETL_INPUT", "data/input.csv")
-    df = pd.read_csv(csv_path)
+
+def _mode() -> str:
+    mode = os.environ.get("ETL_MODE", "full")
+    if mode not in MODES:
+        raise ValueError(f"ETL_MODE debe ser uno de {MODES}: {mode!r}")
+    return mode
+
+
+def _lean_dtypes() -> bool:
+    return os.environ.get("ETL_LEAN_DTYPES", "1") == "1"
+
+
+def input_dtypes(path: str) -> Dict[str, str]:
+    """
+    Esquema de lectura: `name` como categoría si en una muestra del archivo
+    tiene pocos valores distintos (los códigos ocupan 1-2 bytes por fila en
+    vez de un str por fila); si no, se deja el tipo que infiera pandas.
+    Vacío si ETL_LEAN_DTYPES=0.
+    """
+    if not _lean_dtypes():
+        return {}
+    sample = pd.read_csv(path, usecols=["name"], nrows=DTYPE_SAMPLE_ROWS)["name"]
+    if sample.nunique() <= CATEGORY_MAX_RATIO * len(sample):
+        return {"name": "category"}
+    return {}
+
+
+def downcast(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reduce `value` en el lugar: enteros al entero más pequeño que los contiene
+    y flotantes a float32 solo si todos los valores se representan exactos.
+    """
+    if not _lean_dtypes():
+        return df
+    value = df["value"]
+    if pd.api.types.is_integer_dtype(value):
+        df["value"] = pd.to_numeric(value, downcast="integer")
+    elif pd.api.types.is_float_dtype(value) and value.dtype != np.float32:
+        narrow = value.astype(np.float32)
+        if np.array_equal(narrow.to_numpy(np.float64), value.to_numpy(), equal_nan=True):
+            df["value"] = narrow
     return df
 
 
+def bytes_per_row(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True, index=False).sum() / len(df) if len(df) else 0.0
+
+
+def memory_report(path: Optional[str] = None, nrows: int = DTYPE_SAMPLE_ROWS) -> Dict[str, float]:
+    """
+    Bytes por fila de una muestra ya transformada, con los tipos que infiere
+    pandas y con el esquema ligero.
+    """
+    path = path or _input_path()
+    inferred = transform(pd.read_csv(path, nrows=nrows))
+    lean = transform(downcast(pd.read_csv(path, nrows=nrows, dtype=input_dtypes(path))))
+    return {
+        "sample_rows": len(inferred),
+        "bytes_per_row_inferred": float(bytes_per_row(inferred)),
+        "bytes_per_row_lean": float(bytes_per_row(lean)),
+    }
+
+
+def discover_inputs(spec: Optional[str] = None) -> List[str]:
+    """
+    Archivos de entrada según ETL_INPUT: un archivo, un directorio (sus *.csv)
+    o un patrón glob. Se devuelven ordenados.
+    """
+    spec = spec or _input_path()
+    if os.path.isdir(spec):
+        return sorted(str(p) for p in Path(spec).glob("*.csv"))
+    if glob.has_magic(spec):
+        return sorted(glob.glob(spec))
+    return [spec]
+
+
+def extract(path: Optional[str] = None):
+    csv_path = path or _input_path()
+    df = pd.read_csv(csv_path, dtype=input_dtypes(csv_path))
+    return downcast(df)
+
+
+def extract_chunks(chunksize: int, path: Optional[str] = None) -> Iterator[pd.DataFrame]:
+    """Lee el CSV de entrada bloque a bloque (DataFrames de hasta `chunksize` filas)."""
+    path = path or _input_path()
+    with pd.read_csv(path, chunksize=chunksize, dtype=input_dtypes(path)) as reader:
+        for chunk in reader:
+            yield downcast(chunk)
+
+
 def transform(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    df["value_squared"] = df["value"] ** 2
-    return df[["name", "value", "value_squared"]]
-
-
-def _get_conn():
-    return psycopg2.connect(
-        dbname=os.environ["POSTGRES_DB"],
-        user=os.environ["POSTGRES_USER"],
-        password=os.environ["POSTGRES_PASSWORD"],
-        host=os.environ.get("POSTGRES_HOST", "postgres"),
-        port=os.environ.get("POSTGRES_PORT", "5432"),
-        connect_timeout=5,
+    """
+    Añade value_squared al mismo DataFrame (sin copiarlo). El cuadrado se
+    calcula en int64/float64 aunque `value` venga reducido, para no desbordar.
+    """
+    value = df["value"]
+    if not pd.api.types.is_numeric_dtype(value):
+        df["value"] = value = pd.to_numeric(value)
+    wide = np.int64 if pd.api.types.is_integer_dtype(value) else np.float64
+    df["value_squared"] = np.square(value, dtype=wide)
+    return df if list(df.columns) == COLUMNS else df[COLUMNS]
+
+
+def load(df: pd.DataFrame, sink: Optional[Sink] = None) -> None:
+    load_batches([df], sink)
+
+
+def load_batches(batches: Iterable[pd.DataFrame], sink: Optional[Sink] = None) -> int:
+    """
+    Carga los lotes en el sink (por defecto el de ETL_SINK) a medida que
+    llegan; el sink confirma la carga completa al final. Registra las
+    filas/s de cada lote y devuelve las filas que el destino informa haber
+    escrito (`Sink.rows_written`).
+    """
+    sink = get_sink() if sink is None else sink
+    with sink:
+        write_batches(sink, batches)
+    return sink.rows_written
+
+
+def write_batches(sink: Sink, batches: Iterable[pd.DataFrame]) -> int:
+    """Escribe los lotes en un sink ya abierto y devuelve las filas escritas."""
+    rows = 0
+    for df in batches:
+        start = time.perf_counter()
+        sink.write(df)
+        elapsed = time.perf_counter() - start
+        rows += len(df)
+        logger.info(
+            "Lote de %d filas cargado en %s en %.3f s (%.0f filas/s)",
+            len(df), sink.describe(), elapsed, len(df) / elapsed if elapsed else 0.0,
+        )
+    return rows
+
+
+# Semáforo compartido por los procesos del pool: limita las cargas simultáneas
+_loader_slots = None
+
+
+def _init_worker(slots) -> None:
+    global _loader_slots
+    _loader_slots = slots
+
+
+def _loader_slot():
+    return _loader_slots if _loader_slots is not None else nullcontext()
+
+
+def _incremental_sink(path: str) -> IncrementalPostgresSink:
+    if os.environ.get("ETL_SINK", "postgres") != "postgres":
+        raise ValueError("ETL_MODE=incremental requiere ETL_SINK=postgres")
+    return IncrementalPostgresSink(path, os.environ.get("ETL_LOAD_METHOD", "copy"))
+
+
+def run_incremental(
+    chunksize: int, path: Optional[str] = None, report: Optional[RunReport] = None
+) -> int:
+    """
+    Carga solo el tramo de ETL_INPUT posterior a su watermark y lo fusiona
+    en processed_data; el watermark avanza en la misma transacción.
+    """
+    path = path or _input_path()
+    report = report or RunReport()
+    sink = _incremental_sink(path)
+    with _loader_slot(), report.stage("load"), sink:
+        with report.stage("extract"):
+            delta = incremental.plan(path, sink.watermark)
+        sink.start_row = delta.rows_before
+        chunks = incremental.read_delta(path, delta, chunksize, dtype=input_dtypes(path))
+        frames = report.iterate("extract", (downcast(chunk) for chunk in chunks))
+        batches = (report.apply("transform", transform, frame) for frame in frames)
+        rows = write_batches(sink, batches)
+        sink.watermark = delta.advance(rows)
+    report.add_rows("load", sink.rows_written)
+    logger.info("Incremental: %d filas nuevas en %s desde el byte %d", rows, path, delta.start)
+    return sink.rows_written
+
+
+def run_full(
+    chunksize: int,
+    path: Optional[str] = None,
+    sink: Optional[Sink] = None,
+    report: Optional[RunReport] = None,
+) -> int:
+    """
+    Carga el archivo completo. El sink (y el cupo de cargador) se toma recién
+    con el primer lote transformado.
+    """
+    report = report or RunReport()
+    if chunksize > 0:
+        chunks = extract_chunks(chunksize, path)
+    else:
+        chunks = (extract(path) for _ in range(1))
+    frames = report.iterate("extract", chunks)
+    batches = (report.apply("transform", transform, frame) for frame in frames)
+    first = next(batches, None)
+    if first is None:
+        return 0
+    with _loader_slot(), report.stage("load"):
+        rows = load_batches(chain([first], batches), sink)
+    report.add_rows("load", rows)
+    return rows
+
+
+def run_partition(
+    path: str, chunksize: Optional[int] = None, output: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Ejecuta el ETL de una partición y devuelve su informe. Cada partición se
+    carga en una sola transacción (en modo incremental, junto a su
+    watermark), así que reintentarla tras un fallo no duplica filas.
+    """
+    chunksize = _chunksize() if chunksize is None else chunksize
+    output = output or _partition_output(path)
+    report = RunReport(partition=path, pid=os.getpid())
+    if _mode() == "incremental":
+        rows = run_incremental(chunksize or DEFAULT_CHUNKSIZE, path, report)
+    else:
+        rows = run_full(chunksize, path, get_sink(output=output) if output else None, report)
+    return {**report.to_dict(), "rows": rows}
+
+
+def _partition_output(path: str) -> Optional[str]:
+    """
+    Con ETL_SINK=parquet y varias particiones, ETL_OUTPUT es un directorio
+    con un archivo por partición.
+    """
+    if os.environ.get("ETL_SINK", "postgres") != "parquet":
+        return None
+    out_dir = Path(os.environ.get("ETL_OUTPUT", "data/processed"))
+    out_dir.mkdir(parents=True, exist_ok=True)
+    return str(out_dir / f"{Path(path).stem}.parquet")
+
+
+def max_loaders(loaders: int) -> int:
+    """Cargas simultáneas admitidas por el sink (SQLite admite un único escritor)."""
+    return 1 if os.environ.get("ETL_SINK", "postgres") == "sqlite" else loaders
+
+
+def prepare_sink() -> None:
+    """
+    Crea el esquema de destino una sola vez, antes de repartir las
+    particiones, y no en cada proceso a la vez.
+    """
+    if _mode() == "incremental":
+        _incremental_sink("").prepare()
+    elif os.environ.get("ETL_SINK", "postgres") == "postgres":
+        get_sink("postgres").prepare()
+
+
+def run_partitions(paths: List[str], chunksize: int, workers: int, loaders: int) -> Dict[str, Any]:
+    """
+    Procesa las particiones en un pool de procesos con como mucho `loaders`
+    cargas simultáneas. Una partición fallida no detiene a las demás: se
+    informa en `failed` del resumen devuelto.
+    """
+    loaders = max_loaders(loaders)
+    prepare_sink()
+    db.close_pool()  # los workers abren sus propias conexiones
+
+    ctx = multiprocessing.get_context()
+    slots = ctx.BoundedSemaphore(loaders)
+    start = time.perf_counter()
+    partitions, failed = [], []
+    with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_worker, initargs=(slots,)) as pool:
+        futures = {
+            pool.submit(run_partition, path, chunksize): path for path in paths
+        }
+        for future in as_completed(futures):
+            try:
+                partitions.append(future.result())
+            except Exception as exc:
+                logger.error("Partición %s falló: %s", futures[future], exc)
+                failed.append({"partition": futures[future], "error": str(exc)})
+
+    partitions.sort(key=lambda p: p["partition"])
+    elapsed = time.perf_counter() - start
+    summary = {
+        "partitions": partitions,
+        "failed": failed,
+        "rows": sum(p["rows"] for p in partitions),
+        "seconds": elapsed,
+        "workers": workers,
+        "loaders": loaders,
+    }
+    for p in partitions:
+        logger.info("Partición %s: %d filas en %.2f s", p["partition"], p["rows"], p["wall_seconds"])
+    logger.info(
+        "Total: %d particiones (%d fallidas), %d filas en %.2f s (%.0f filas/s)",
+        len(paths), len(failed), summary["rows"], elapsed, summary["rows"] / elapsed if elapsed else 0.0,
     )
+    return summary
+
+
+def reconcile(reports: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Comprueba los conteos de cada partición: las filas que el destino informa
+    haber escrito (rowcount de COPY, executemany o del merge incremental,
+    total_changes de SQLite, filas del Parquet) deben ser las que leyó el
+    extractor (todo el archivo o, en modo incremental, el tramo nuevo). Lanza
+    ValueError con las que no cuadran; si no, devuelve los totales.
+    """
+    mismatches = []
+    for report in reports:
+        expected = report["stages"]["extract"]["rows"]
+        if report["rows"] != expected:
+            mismatches.append(f"{report['partition']}: {report['rows']} cargadas de {expected}")
+    if mismatches:
+        raise ValueError("Los conteos no cuadran en " + "; ".join(mismatches))
+
+    summary = {
+        "partitions": len(reports),
+        "rows": sum(r["rows"] for r in reports),
+        "stages": merge_stages(reports),
+    }
+    logger.info("Reconciliación correcta: %d particiones, %d filas", summary["partitions"], summary["rows"])
+    return summary
+
+
+def _log_stages(stages: Dict[str, Dict[str, Any]]) -> None:
+    for name, stats in stages.items():
+        logger.info(
+            "Etapa %s: %.2f s de pared, %.2f s de CPU, %d filas (%.0f filas/s), pico RSS %.1f MiB",
+            name, stats["wall_seconds"], stats["cpu_seconds"], stats["rows"],
+            stats["rows_per_second"], stats["peak_rss_bytes"] / 2**20,
+        )
+
+
+def run_etl_report(chunksize: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Ejecuta el ETL y devuelve su informe: filas, tiempos y memoria totales y
+    por etapa (con varias particiones, también por partición; sus tiempos por
+    etapa se suman entre workers). Si ETL_REPORT indica una ruta, lo guarda
+    como JSON. Lanza RuntimeError (tras guardar el informe) si alguna
+    partición falló.
+    """
+    chunksize = _chunksize() if chunksize is None else chunksize
+    paths = discover_inputs()
+    if not paths:
+        raise FileNotFoundError(f"ETL_INPUT no contiene archivos: {_input_path()!r}")
+    report = RunReport(
+        input=_input_path(),
+        mode=_mode(),
+        sink=os.environ.get("ETL_SINK", "postgres"),
+        chunksize=chunksize,
+        partitions_total=len(paths),
+    )
+    memory = memory_report(paths[0]) if _lean_dtypes() else None
+    if memory:
+        logger.info(
+            "Memoria por fila (muestra de %d filas): %.1f B con tipos inferidos, %.1f B con el esquema ligero",
+            memory["sample_rows"], memory["bytes_per_row_inferred"], memory["bytes_per_row_lean"],
+        )
+
+    if len(paths) > 1:
+        workers = min(_workers(), len(paths))
+        summary = run_partitions(paths, chunksize, workers, _loaders(workers))
+        result = report.to_dict()
+        result["stages"] = merge_stages(summary["partitions"])
+        result.update(summary)
+    else:
+        if _mode() == "incremental":
+            rows = run_incremental(chunksize or DEFAULT_CHUNKSIZE, paths[0], report)
+        else:
+            rows = run_full(chunksize, paths[0], report=report)
+        result = {**report.to_dict(), "rows": rows}
+    result["memory"] = memory
+
+    _log_stages(result["stages"])
+    path = write_report(result)
+    if path:
+        logger.info("Informe de la ejecución en %s", path)
+    if result.get("failed"):
+        raise RuntimeError(f"{len(result['failed'])} de {len(paths)} particiones fallaron")
+    return result
 
 
-def load(df: pd.DataFrame) -> None:
-    with _get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS processed_data (
-                    name TEXT,
-                    value NUMERIC,
-                    value_squared NUMERIC
-                )
-                """
-            )
-        with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-            cur.executemany(
-                """
-                INSERT INTO processed_data (name, value, value_squared)
-                VALUES (%(name)s, %(value)s, %(value_squared)s)
-                """,
-                df.to_dict(orient="records"),
-            )
-        conn.commit()
-
-
-def run_etl():
-    df_raw = extract()
-    df_clean = transform(df_raw)
-    load(df_clean)
+def run_etl(chunksize: Optional[int] = None) -> int:
+    return run_etl_report(chunksize)["rows"]
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
     run_etl()
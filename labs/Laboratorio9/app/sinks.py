@@ -0,0 +1,439 @@
+"""
+Destinos (sinks) de la etapa Load del ETL.
+
+Todos comparten la misma interfaz: `with sink:` abre el destino, `write(df)`
+recibe cada lote y, al salir sin errores, la carga se confirma de una vez
+(si algo falla no queda una carga a medias). Tras confirmar, `rows_written`
+son las filas que el destino informa haber escrito (no las enviadas), para
+reconciliarlas con las leídas. Se elige con ETL_SINK:
+
+- postgres (por defecto): tabla processed_data, con COPY o executemany
+- sqlite: tabla processed_data en un archivo local (ETL_OUTPUT)
+- parquet: archivo columnar para analítica (ETL_OUTPUT); requiere pyarrow
+- null: descarta las filas; sirve para medir extract/transform por separado
+
+Con ETL_MODE=incremental se usa IncrementalPostgresSink (staging + merge).
+"""
+
+import io
+import logging
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Optional, Type
+
+import pandas as pd
+import psycopg2
+
+import db
+from incremental import Watermark
+
+LOAD_METHODS = ("copy", "insert")
+COLUMNS = ["name", "value", "value_squared"]
+COPY_SQL = "COPY {table} (name, value, value_squared) FROM STDIN WITH (FORMAT csv)"
+
+logger = logging.getLogger("etl")
+
+
+def _records(df: pd.DataFrame):
+    """
+    Filas del lote como tuplas de tipos de Python (NaN -> None), una a una:
+    no se materializa una lista de diccionarios del tamaño del lote.
+    """
+    rows = df[COLUMNS].astype(object)
+    rows = rows.where(rows.notna(), None)
+    return rows.itertuples(index=False, name=None)
+
+
+class Sink(ABC):
+    """
+    Interfaz común de los destinos. Las subclases implementan `write` y
+    `commit`; `open` y `close` solo si necesitan abrir o liberar recursos.
+    """
+
+    name = "sink"
+    # Filas que el destino informa haber escrito en esta carga
+    rows_written = 0
+
+    def __enter__(self) -> "Sink":
+        self.rows_written = 0
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            if exc_type is None:
+                self.commit()
+        finally:
+            self.close()
+
+    def describe(self) -> str:
+        """Nombre a mostrar en los registros de cada lote."""
+        return self.name
+
+    def open(self) -> None:
+        pass
+
+    @abstractmethod
+    def write(self, df: pd.DataFrame) -> None:
+        """Recibe un lote transformado."""
+
+    @abstractmethod
+    def commit(self) -> None:
+        """Confirma de una vez todos los lotes escritos."""
+
+    def close(self) -> None:
+        pass
+
+
+class PostgresSink(Sink):
+    """
+    Carga en PostgreSQL con una conexión del pool (ver db.py) y una
+    transacción. Con method="copy" cada lote viaja por COPY ... FROM STDIN
+    como un CSV en memoria; si COPY falla, ese lote se deshace (savepoint) y
+    él y los siguientes van por executemany.
+
+    Tomar la conexión y preparar la transacción se reintenta ante errores
+    transitorios; un fallo a mitad de la carga la deshace entera.
+    """
+
+    name = "postgres"
+    # Tabla que reciben los lotes
+    table = "processed_data"
+
+    def __init__(self, method: str = "copy") -> None:
+        if method not in LOAD_METHODS:
+            raise ValueError(f"ETL_LOAD_METHOD debe ser uno de {LOAD_METHODS}: {method!r}")
+        self.method = method
+        self.conn = None
+        self._pool: Optional[db.ConnectionPool] = None
+
+    def describe(self) -> str:
+        return f"{self.name}/{self.method}"
+
+    def open(self) -> None:
+        self._pool = db.get_pool()
+        self.conn = db.retry(self._open)
+
+    def _open(self):
+        conn = self._pool.acquire()
+        try:
+            with conn.cursor() as cur:
+                self._setup(cur)
+        except Exception:
+            self._pool.release(conn)
+            raise
+        return conn
+
+    def _setup(self, cur) -> None:
+        """Sentencias iniciales de la transacción de carga."""
+        self._create_tables(cur)
+
+    def _create_tables(self, cur) -> None:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS processed_data (
+                name TEXT,
+                value NUMERIC,
+                value_squared NUMERIC,
+                source TEXT,
+                source_row BIGINT
+            )
+            """
+        )
+        self._migrate_row_identity(cur)
+
+    def _migrate_row_identity(self, cur) -> None:
+        """
+        Columnas e índice de la identidad de fila del modo incremental
+        (source, source_row; NULL en modo full) en tablas creadas sin ellas.
+        El índice se crea después de las columnas, así que basta mirar si
+        existe para no pedir locks exclusivos en cada carga.
+        """
+        cur.execute("SELECT to_regclass('processed_data_source_row_key')")
+        if cur.fetchone()[0] is not None:
+            return
+        cur.execute(
+            "ALTER TABLE processed_data "
+            "ADD COLUMN IF NOT EXISTS source TEXT, ADD COLUMN IF NOT EXISTS source_row BIGINT"
+        )
+        cur.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS processed_data_source_row_key "
+            "ON processed_data (source, source_row)"
+        )
+
+    def prepare(self) -> None:
+        """
+        Crea el esquema en una transacción propia. Con varias cargas en
+        paralelo se llama una vez antes, para que no compitan creando tablas.
+        """
+        def create(conn) -> None:
+            with conn.cursor() as cur:
+                self._create_tables(cur)
+
+        db.transaction(create)
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.method == "copy":
+            self._copy_or_insert(df)
+        else:
+            self._insert(df)
+
+    def commit(self) -> None:
+        self.conn.commit()
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self._pool.release(self.conn)
+            self.conn = None
+
+    def _insert(self, df: pd.DataFrame) -> None:
+        with self.conn.cursor() as cur:
+            cur.executemany(
+                f"INSERT INTO {self.table} (name, value, value_squared) VALUES (%s, %s, %s)",
+                _records(df),
+            )
+            self.rows_written += cur.rowcount
+
+    def _copy(self, df: pd.DataFrame) -> None:
+        # En formato CSV de COPY un campo vacío sin comillas es NULL (los NaN de pandas)
+        buffer = io.StringIO()
+        df[COLUMNS].to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        with self.conn.cursor() as cur:
+            cur.copy_expert(COPY_SQL.format(table=self.table), buffer)
+            self.rows_written += cur.rowcount
+
+    def _copy_or_insert(self, df: pd.DataFrame) -> None:
+        with self.conn.cursor() as cur:
+            cur.execute("SAVEPOINT etl_batch")
+        try:
+            self._copy(df)
+        except psycopg2.Error as exc:
+            with self.conn.cursor() as cur:
+                cur.execute("ROLLBACK TO SAVEPOINT etl_batch")
+            logger.warning("COPY falló (%s); se usa executemany", exc)
+            self.method = "insert"
+            self._insert(df)
+            return
+        with self.conn.cursor() as cur:
+            cur.execute("RELEASE SAVEPOINT etl_batch")
+
+
+class IncrementalPostgresSink(PostgresSink):
+    """
+    Carga incremental en PostgreSQL: los lotes van a una tabla temporal de
+    staging y al confirmar se fusionan en processed_data por la identidad
+    de cada fila en su entrada, (source, source_row): la ruta y la posición
+    de la fila en el archivo. `name` no es clave (puede repetirse), así que
+    no se fusiona por él. El watermark de la entrada se guarda en la misma
+    transacción, así un fallo no avanza la marca.
+    """
+
+    name = "postgres-incremental"
+    table = "processed_data_stage"
+
+    def __init__(self, input_key: str, method: str = "copy") -> None:
+        super().__init__(method)
+        self.input_key = input_key
+        self.watermark: Optional[Watermark] = None
+        # Filas de la entrada ya cargadas antes del primer lote de esta ejecución
+        self.start_row = 0
+
+    def _create_tables(self, cur) -> None:
+        super()._create_tables(cur)
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS etl_watermarks (
+                input TEXT PRIMARY KEY,
+                rows_done BIGINT NOT NULL,
+                bytes_done BIGINT NOT NULL,
+                checksum TEXT NOT NULL,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+            """
+        )
+
+    def _setup(self, cur) -> None:
+        super()._setup(cur)
+        # Dos ejecuciones sobre la misma entrada se serializan hasta el commit
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (self.input_key,))
+        cur.execute(
+            "SELECT rows_done, bytes_done, checksum FROM etl_watermarks WHERE input = %s",
+            (self.input_key,),
+        )
+        row = cur.fetchone()
+        self.watermark = Watermark(*row) if row else None
+        # seq conserva el orden de llegada, es decir, el orden de las filas en el archivo
+        cur.execute(
+            f"""
+            CREATE TEMP TABLE {self.table} (
+                seq BIGSERIAL,
+                name TEXT,
+                value NUMERIC,
+                value_squared NUMERIC
+            ) ON COMMIT DROP
+            """
+        )
+
+    def commit(self) -> None:
+        with self.conn.cursor() as cur:
+            # row_number y no seq: un COPY deshecho por el savepoint deja huecos en la secuencia
+            cur.execute(
+                f"""
+                INSERT INTO processed_data (name, value, value_squared, source, source_row)
+                SELECT name, value, value_squared, %s, %s + row_number() OVER (ORDER BY seq)
+                FROM {self.table}
+                ON CONFLICT (source, source_row) DO UPDATE
+                SET name = EXCLUDED.name, value = EXCLUDED.value, value_squared = EXCLUDED.value_squared
+                """,
+                (self.input_key, self.start_row),
+            )
+            # Lo escrito en staging no cuenta: lo que llega al destino es el merge
+            self.rows_written = cur.rowcount
+            logger.info("Merge incremental: %d filas insertadas o actualizadas", cur.rowcount)
+            if self.watermark is not None:
+                # Si la entrada se reescribió más corta, sobran sus filas del final
+                cur.execute(
+                    "DELETE FROM processed_data WHERE source = %s AND source_row > %s",
+                    (self.input_key, self.watermark.rows_done),
+                )
+                cur.execute(
+                    """
+                    INSERT INTO etl_watermarks (input, rows_done, bytes_done, checksum)
+                    VALUES (%s, %s, %s, %s)
+                    ON CONFLICT (input) DO UPDATE
+                    SET rows_done = EXCLUDED.rows_done, bytes_done = EXCLUDED.bytes_done,
+                        checksum = EXCLUDED.checksum, updated_at = now()
+                    """,
+                    (self.input_key, *self.watermark),
+                )
+        super().commit()
+
+
+class SQLiteSink(Sink):
+    """
+    Carga en la tabla processed_data de un archivo SQLite local, en una transacción.
+    """
+
+    name = "sqlite"
+    default_output = "data/processed.db"
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.conn: Optional[sqlite3.Connection] = None
+
+    def open(self) -> None:
+        # Varios procesos pueden cargar a la vez: esperan el bloqueo de escritura
+        self.conn = sqlite3.connect(self.path, timeout=60)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS processed_data (
+                name TEXT,
+                value REAL,
+                value_squared REAL
+            )
+            """
+        )
+
+    def write(self, df: pd.DataFrame) -> None:
+        before = self.conn.total_changes
+        self.conn.executemany(
+            "INSERT INTO processed_data (name, value, value_squared) VALUES (?, ?, ?)",
+            _records(df),
+        )
+        self.rows_written += self.conn.total_changes - before
+
+    def commit(self) -> None:
+        self.conn.commit()
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class ParquetSink(Sink):
+    """
+    Escribe un archivo Parquet con un row group por lote. Se escribe en un
+    archivo temporal que reemplaza al destino solo al confirmar. Cada ejecución
+    sobrescribe el archivo (no acumula como las tablas).
+    """
+
+    name = "parquet"
+    default_output = "data/processed.parquet"
+
+    def __init__(self, path: str) -> None:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as exc:
+            raise RuntimeError("ETL_SINK=parquet requiere pyarrow (pip install pyarrow)") from exc
+        self._pa = pa
+        self._pq = pq
+        # Esquema fijo: un lote sin decimales (int64) no cambia el tipo del archivo
+        self.schema = pa.schema(
+            [("name", pa.string()), ("value", pa.float64()), ("value_squared", pa.float64())]
+        )
+        self.path = Path(path)
+        self._tmp = self.path.with_name(self.path.name + ".tmp")
+        self._writer = None
+
+    def open(self) -> None:
+        self._writer = self._pq.ParquetWriter(self._tmp, self.schema)
+
+    def write(self, df: pd.DataFrame) -> None:
+        table = self._pa.Table.from_pandas(df[COLUMNS], schema=self.schema, preserve_index=False)
+        self._writer.write_table(table)
+
+    def commit(self) -> None:
+        self._writer.close()
+        self._writer = None
+        self.rows_written = self._pq.read_metadata(self._tmp).num_rows
+        os.replace(self._tmp, self.path)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._tmp.unlink(missing_ok=True)
+
+
+class NullSink(Sink):
+    """
+    Descarta los lotes: el tiempo de la ejecución es solo extract + transform.
+    No hay destino que consultar: cuenta como escritas las filas recibidas.
+    """
+
+    name = "null"
+
+    def write(self, df: pd.DataFrame) -> None:
+        self.rows_written += len(df)
+
+    def commit(self) -> None:
+        pass
+
+
+SINKS: Dict[str, Type[Sink]] = {
+    "postgres": PostgresSink,
+    "sqlite": SQLiteSink,
+    "parquet": ParquetSink,
+    "null": NullSink,
+}
+
+
+def get_sink(name: Optional[str] = None, output: Optional[str] = None) -> Sink:
+    """
+    Crea el sink indicado (o el de ETL_SINK) con su configuración de entorno:
+    ETL_LOAD_METHOD para postgres y ETL_OUTPUT (o `output`) para sqlite/parquet.
+    """
+    name = name or os.environ.get("ETL_SINK", "postgres")
+    if name not in SINKS:
+        raise ValueError(f"ETL_SINK debe ser uno de {tuple(SINKS)}: {name!r}")
+    if name == "postgres":
+        return PostgresSink(os.environ.get("ETL_LOAD_METHOD", "copy"))
+    if name in ("sqlite", "parquet"):
+        cls = SINKS[name]
+        return cls(output or os.environ.get("ETL_OUTPUT", cls.default_output))
+    return SINKS[name]()
@@ -0,0 +1,16 @@
+import os
+
+import pytest
+
+import db
+
+
+@pytest.fixture
+def postgres():
+    """Salta la prueba si no hay un PostgreSQL configurado (POSTGRES_*) y accesible."""
+    if "POSTGRES_DB" not in os.environ:
+        pytest.skip("sin PostgreSQL configurado (POSTGRES_*)")
+    try:
+        db.connect().close()
+    except Exception as exc:
+        pytest.skip(f"PostgreSQL no disponible: {exc}")
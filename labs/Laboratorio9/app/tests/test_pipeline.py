@@ -1,6 +1,19 @@
+import json
+import sqlite3
+
+import numpy as np
 import pandas as pd
+import psycopg2
+import pytest
+
+import db
+import incremental
+import metrics
+import pipeline
+import sinks
 from pipeline import transform
 
+
 def test_transform_squares_values():
     df_in = pd.DataFrame([
         {"name": "a", "value": 2},
@@ -10,3 +23,238 @@ def test_transform_squares_values():
 
     assert list(df_out["value_squared"]) == [4, 9]
     assert set(df_out.columns) == {"name", "value", "value_squared"}
+
+
+def test_streaming_reads_bounded_chunks(tmp_path, monkeypatch):
+    csv = tmp_path / "input.csv"
+    csv.write_text("name,value\n" + "".join(f"n{i},{i}\n" for i in range(5)))
+    monkeypatch.setenv("ETL_INPUT", str(csv))
+
+    chunks = [transform(chunk) for chunk in pipeline.extract_chunks(2)]
+
+    assert [len(c) for c in chunks] == [2, 2, 1]
+    assert list(pd.concat(chunks)["value_squared"]) == [0, 1, 4, 9, 16]
+
+
+def test_copy_and_insert_loads_match(postgres):
+    try:
+        for method in sinks.LOAD_METHODS:
+            names = [f"copy-test-{method}-1", f"copy-test-{method}-2"]
+            df = transform(pd.DataFrame({"name": names, "value": [1.5, None]}))
+            assert pipeline.load_batches([df], sinks.PostgresSink(method)) == 2
+        # Las cargas reutilizan la conexión del pool
+        assert len(db.get_pool()._idle) == 1
+        with db.connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                "SELECT value, value_squared, count(*) FROM processed_data "
+                "WHERE name LIKE 'copy-test-%' GROUP BY 1, 2 ORDER BY 1"
+            )
+            assert cur.fetchall() == [(pytest.approx(1.5), pytest.approx(2.25), 2), (None, None, 2)]
+    finally:
+        with db.connection() as conn, conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM processed_data WHERE name LIKE 'copy-test-%'")
+
+
+def test_incremental_merge_keeps_repeated_names(postgres, tmp_path, monkeypatch):
+    csv = tmp_path / "input.csv"
+    csv.write_text("name,value\nrep,1\nrep,2\n")
+    monkeypatch.setenv("ETL_SINK", "postgres")
+
+    def stored():
+        with db.connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                "SELECT source_row, name, value FROM processed_data WHERE source = %s ORDER BY 1", (str(csv),)
+            )
+            return [(row, name, float(value)) for row, name, value in cur.fetchall()]
+
+    def cleanup(conn):
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM processed_data WHERE source = %s OR name = 'full-after'", (str(csv),))
+            cur.execute("DELETE FROM etl_watermarks WHERE input = %s", (str(csv),))
+
+    try:
+        assert pipeline.run_incremental(10, str(csv)) == 2
+        with csv.open("a") as fh:
+            fh.write("rep,3\n")
+        assert pipeline.run_incremental(10, str(csv)) == 1
+        assert stored() == [(1, "rep", 1.0), (2, "rep", 2.0), (3, "rep", 3.0)]
+
+        csv.write_text("name,value\nnuevo,9\n")  # reescrito más corto: se reemplaza
+        assert pipeline.run_incremental(10, str(csv)) == 1
+        assert stored() == [(1, "nuevo", 9.0)]
+
+        # El modo full sigue pudiendo cargar nombres repetidos
+        df = transform(pd.DataFrame({"name": ["full-after", "full-after"], "value": [1, 1]}))
+        assert pipeline.load_batches([df], sinks.PostgresSink()) == 2
+    finally:
+        db.transaction(cleanup)
+
+
+def test_local_sinks_write_all_batches(tmp_path, monkeypatch):
+    batches = [
+        transform(pd.DataFrame({"name": ["a", "b"], "value": [1, 2]})),
+        transform(pd.DataFrame({"name": ["c"], "value": [None]})),
+    ]
+
+    monkeypatch.setenv("ETL_OUTPUT", str(tmp_path / "out.db"))
+    assert pipeline.load_batches(batches, sinks.get_sink("sqlite")) == 3
+    with sqlite3.connect(tmp_path / "out.db") as conn:
+        assert conn.execute("SELECT * FROM processed_data").fetchall() == [
+            ("a", 1.0, 1.0), ("b", 2.0, 4.0), ("c", None, None)
+        ]
+
+    pytest.importorskip("pyarrow")
+    monkeypatch.setenv("ETL_OUTPUT", str(tmp_path / "out.parquet"))
+    assert pipeline.load_batches(batches, sinks.get_sink("parquet")) == 3
+    out = pd.read_parquet(tmp_path / "out.parquet")
+    assert list(out["value_squared"].fillna(-1)) == [1.0, 4.0, -1]
+    assert not (tmp_path / "out.parquet.tmp").exists()
+
+
+def test_incremental_plan_reads_only_appended_rows(tmp_path):
+    csv = tmp_path / "input.csv"
+    csv.write_text("name,value\na,1\nb,2\n")
+    first = incremental.plan(str(csv), None)
+    rows = pd.concat(incremental.read_delta(str(csv), first, chunksize=10))
+    assert list(rows["name"]) == ["a", "b"]
+    watermark = first.advance(len(rows))
+
+    with csv.open("a") as fh:
+        fh.write("c,3\nd,")  # la última línea aún no está completa
+    second = incremental.plan(str(csv), watermark)
+    assert list(pd.concat(incremental.read_delta(str(csv), second, chunksize=10))["name"]) == ["c"]
+    assert second.advance(1).rows_done == 3
+
+    csv.write_text("name,value\nz,9\n")  # archivo reescrito: se reprocesa completo
+    assert incremental.plan(str(csv), second.advance(1)).start == len("name,value\n")
+
+
+def test_partitioned_inputs_load_in_parallel(tmp_path, monkeypatch):
+    parts = tmp_path / "parts"
+    parts.mkdir()
+    for i in range(3):
+        (parts / f"part-{i}.csv").write_text(f"name,value\np{i}a,{i}\np{i}b,{i + 10}\n")
+    (parts / "notes.txt").write_text("no es una partición")
+    monkeypatch.setenv("ETL_INPUT", str(parts))
+    monkeypatch.setenv("ETL_SINK", "sqlite")
+    monkeypatch.setenv("ETL_OUTPUT", str(tmp_path / "out.db"))
+    monkeypatch.setenv("ETL_WORKERS", "2")
+
+    assert len(pipeline.discover_inputs()) == 3
+    assert pipeline.discover_inputs(str(parts / "part-[01].csv")) == [
+        str(parts / "part-0.csv"), str(parts / "part-1.csv")
+    ]
+    report = pipeline.run_partitions(pipeline.discover_inputs(), chunksize=1, workers=2, loaders=2)
+
+    assert [p["rows"] for p in report["partitions"]] == [2, 2, 2]
+    assert report["loaders"] == 1  # SQLite: un único escritor
+    with sqlite3.connect(tmp_path / "out.db") as conn:
+        assert conn.execute("SELECT count(*), sum(value_squared) FROM processed_data").fetchone() == (6, 370.0)
+
+
+def test_lean_dtypes_shrink_rows_without_changing_values(tmp_path, monkeypatch):
+    csv = tmp_path / "input.csv"
+    csv.write_text("name,value\n" + "".join(f"n{i % 3},{i % 100 - 50}\n" for i in range(200)))
+    monkeypatch.setenv("ETL_INPUT", str(csv))
+
+    df = pipeline.extract()
+    assert str(df["name"].dtype) == "category" and str(df["value"].dtype) == "int8"
+    out = transform(df)
+    assert out is df  # sin copia
+    assert str(out["value_squared"].dtype) == "int64" and out["value_squared"].max() == 2500
+
+    report = pipeline.memory_report()
+    assert report["bytes_per_row_lean"] < report["bytes_per_row_inferred"] / 2
+
+    precise = pd.DataFrame({"name": ["a", "b"], "value": [0.5, 0.1]})
+    assert str(pipeline.downcast(precise)["value"].dtype) == "float64"  # 0.1 no es exacto en float32
+
+
+def test_run_report_times_each_stage(tmp_path, monkeypatch):
+    csv = tmp_path / "input.csv"
+    csv.write_text("name,value\n" + "".join(f"n{i},{i}\n" for i in range(10)))
+    monkeypatch.setenv("ETL_INPUT", str(csv))
+    monkeypatch.setenv("ETL_SINK", "null")
+    monkeypatch.setenv("ETL_CHUNKSIZE", "3")
+    monkeypatch.setenv("ETL_REPORT", str(tmp_path / "report.json"))
+
+    report = pipeline.run_etl_report()
+
+    assert report["rows"] == 10
+    assert {name: stats["rows"] for name, stats in report["stages"].items()} == {
+        "extract": 10, "transform": 10, "load": 10
+    }
+    assert all(stats["peak_rss_bytes"] > 0 for stats in report["stages"].values())
+    assert sum(s["wall_seconds"] for s in report["stages"].values()) <= report["wall_seconds"]
+    assert json.loads((tmp_path / "report.json").read_text())["stages"] == report["stages"]
+
+
+def test_stage_peak_rss_includes_transient_allocations():
+    report = metrics.RunReport()
+    if not report._hwm:
+        pytest.skip("sin /proc/self/clear_refs")
+    with report.stage("extract"):
+        buffer = np.ones(20_000_000)  # ~150 MiB que se liberan dentro de la etapa
+        del buffer
+    with report.stage("transform"):
+        pass
+    stages = report.to_dict()["stages"]
+    assert stages["extract"]["peak_rss_bytes"] - stages["transform"]["peak_rss_bytes"] > 100 * 2**20
+
+
+def test_reconcile_checks_partition_row_counts(tmp_path, monkeypatch):
+    for i in range(2):
+        # línea en blanco (pandas la salta) y sin salto final
+        (tmp_path / f"part-{i}.csv").write_text(f"name,value\nr{i}a,1\n\nr{i}b,2\nr{i}c,3")
+    monkeypatch.setenv("ETL_SINK", "null")
+
+    reports = [pipeline.run_partition(str(tmp_path / f"part-{i}.csv"), chunksize=2) for i in range(2)]
+    assert pipeline.reconcile(reports)["rows"] == 6
+
+    reports[1]["rows"] -= 1
+    with pytest.raises(ValueError, match="part-1.csv: 2 cargadas de 3"):
+        pipeline.reconcile(reports)
+
+
+def test_reconcile_detects_rows_dropped_by_the_destination(tmp_path, monkeypatch):
+    out = tmp_path / "out.db"
+    with sqlite3.connect(out) as conn:
+        conn.execute("CREATE TABLE processed_data (name TEXT, value REAL, value_squared REAL)")
+        # El destino descarta una fila sin error: el pipeline la envió igual
+        conn.execute(
+            "CREATE TRIGGER drop_row BEFORE INSERT ON processed_data "
+            "WHEN NEW.name = 'perdida' BEGIN SELECT RAISE(IGNORE); END"
+        )
+    csv = tmp_path / "part.csv"
+    csv.write_text("name,value\nok,1\nperdida,2\n")
+    monkeypatch.setenv("ETL_SINK", "sqlite")
+    monkeypatch.setenv("ETL_OUTPUT", str(out))
+
+    report = pipeline.run_partition(str(csv), chunksize=10)
+
+    assert report["rows"] == 1
+    with pytest.raises(ValueError, match="part.csv: 1 cargadas de 2"):
+        pipeline.reconcile([report])
+
+
+def test_db_retry_backs_off_only_on_transient_errors(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(db.time, "sleep", sleeps.append)
+    monkeypatch.setenv("ETL_DB_RETRIES", "4")
+    monkeypatch.setenv("ETL_DB_RETRY_DELAY", "1")
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise psycopg2.OperationalError("could not connect to server")
+        return "ok"
+
+    assert db.retry(flaky) == "ok"
+    assert len(calls) == 3
+    assert 0.5 <= sleeps[0] <= 1 and 1 <= sleeps[1] <= 2  # backoff exponencial con jitter
+
+    calls.clear()
+    with pytest.raises(ValueError):
+        db.retry(lambda: calls.append(1) or int("x"))
+    assert len(calls) == 1
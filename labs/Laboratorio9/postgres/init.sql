@@ -1,5 +1,18 @@
 CREATE TABLE IF NOT EXISTS processed_data (
     name TEXT,
     value NUMERIC,
-    value_squared NUMERIC
+    value_squared NUMERIC,
+    -- Identidad de fila del ETL incremental: entrada y número de fila (NULL en modo full)
+    source TEXT,
+    source_row BIGINT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS processed_data_source_row_key ON processed_data (source, source_row);
+
+-- Marca de agua por archivo de entrada del ETL incremental (ETL_MODE=incremental)
+CREATE TABLE IF NOT EXISTS etl_watermarks (
+    input TEXT PRIMARY KEY,
+    rows_done BIGINT NOT NULL,
+    bytes_done BIGINT NOT NULL,
+    checksum TEXT NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
 );
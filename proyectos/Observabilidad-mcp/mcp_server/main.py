@@ -1,10 +1,11 @@
 import os
 import time
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import httpx
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
 
 PROMETHEUS_URL = os.getenv("PROMETHEUS_URL", "http://prometheus:9090").rstrip("/")
 LOKI_URL = os.getenv("LOKI_URL", "http://loki:3100").rstrip("/")
@@ -12,6 +13,48 @@ TEMPO_URL = os.getenv("TEMPO_URL", "http://tempo:3200").rstrip("/")
 
 SERVICE_NAME = os.getenv("OBS_SERVICE_NAME", "demo-app")
 
+# Timeout por backend y TTL de la caché de respuestas (0 desactiva la caché)
+BACKEND_TIMEOUT_SECONDS = float(os.getenv("OBS_BACKEND_TIMEOUT_SECONDS", "5.0"))
+CACHE_TTL_SECONDS = float(os.getenv("OBS_CACHE_TTL_SECONDS", "5.0"))
+
+# Paginación de la búsqueda TraceQL en Tempo
+TEMPO_PAGE_SIZE = int(os.getenv("OBS_TEMPO_PAGE_SIZE", "500"))
+TEMPO_MAX_PAGES = int(os.getenv("OBS_TEMPO_MAX_PAGES", "20"))
+# Respuestas de Tempo que indican una estrategia de conteo no soportada
+TEMPO_UNSUPPORTED_STATUS = (400, 404)
+
+#  Auto-instrumentación del gateway (expuesta en /metrics)
+
+BACKEND_LATENCY = Histogram(
+    "mcp_gateway_backend_request_duration_seconds",
+    "Latencia de las consultas del gateway a cada backend.",
+    ["backend", "outcome"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+BACKEND_RESPONSE_BYTES = Counter(
+    "mcp_gateway_backend_response_bytes_total",
+    "Bytes recibidos desde cada backend.",
+    ["backend"],
+)
+BACKEND_FAILURES = Counter(
+    "mcp_gateway_backend_failures_total",
+    "Consultas fallidas por backend y tipo de fallo (timeout, http, error).",
+    ["backend", "reason"],
+)
+CACHE_REQUESTS = Counter(
+    "mcp_gateway_cache_requests_total",
+    "Consultas resueltas desde la caché (hit) o desde el backend (miss).",
+    ["backend", "result"],
+)
+REQUEST_LATENCY = Histogram(
+    "mcp_gateway_request_duration_seconds",
+    "Latencia total de los endpoints del propio gateway.",
+    ["path"],
+)
+
+# clave -> (instante de expiración, JSON decodificado)
+_cache: Dict[Tuple[str, str, Tuple[Tuple[str, str], ...]], Tuple[float, Any]] = {}
+
 app = FastAPI(
     title="MCP-style Observability Gateway",
     version="0.1.0",
@@ -22,18 +65,111 @@ app = FastAPI(
 )
 
 
-async def _query_prometheus(query: str) -> float:
-    """Ejecuta una consulta instantánea en Prometheus y devuelve un float (o 0.0 si no hay datos)."""
-    url = f"{PROMETHEUS_URL}/api/v1/query"
+@app.middleware("http")
+async def _observe_requests(request: Request, call_next):
+    """Mide la latencia de cada endpoint del gateway.
+
+    La etiqueta es la plantilla de la ruta (p. ej. `/items/{item_id}`), no la
+    URL cruda, para acotar la cardinalidad; lo que no casa con ninguna ruta
+    se agrupa en `unmatched`.
+    """
+    start = time.perf_counter()
+    try:
+        return await call_next(request)
+    finally:
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        REQUEST_LATENCY.labels(path=path).observe(time.perf_counter() - start)
+
+
+async def _backend_get(
+    backend: str, url: str, params: Dict[str, Any], cache: bool = True
+) -> Optional[Any]:
+    """GET instrumentado contra un backend; devuelve el JSON o None si falla."""
+    return (await _backend_fetch(backend, url, params, cache))[0]
+
+
+async def _backend_fetch(
+    backend: str, url: str, params: Dict[str, Any], cache: bool = True
+) -> Tuple[Optional[Any], str, Optional[int]]:
+    """GET instrumentado contra un backend con caché de corta duración.
+
+    Registra latencia, bytes recibidos, fallos (timeout / http / error) y
+    aciertos de caché. Devuelve (JSON o None, resultado, código HTTP), donde
+    el resultado es `success`, `timeout`, `http` o `error`.
+    Con `cache=False` se omite la caché (p. ej. páginas con `end` absoluto).
+    """
+    # start/end son relativos a "ahora": dentro del TTL la consulta es equivalente
+    key = (
+        backend,
+        url,
+        tuple(sorted((k, str(v)) for k, v in params.items() if k not in ("start", "end"))),
+    )
+    now = time.monotonic()
+    cached = _cache.get(key) if cache else None
+    if cached is not None and cached[0] > now:
+        CACHE_REQUESTS.labels(backend=backend, result="hit").inc()
+        return cached[1], "success", None
+    if cache:
+        CACHE_REQUESTS.labels(backend=backend, result="miss").inc()
+
+    start = time.perf_counter()
+    outcome = "success"
+    status_code = None
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            resp = await client.get(url, params={"query": query})
-            resp.raise_for_status()
+        async with httpx.AsyncClient(timeout=BACKEND_TIMEOUT_SECONDS) as client:
+            resp = await client.get(url, params=params)
+        status_code = resp.status_code
+        BACKEND_RESPONSE_BYTES.labels(backend=backend).inc(len(resp.content))
+        resp.raise_for_status()
+        data = resp.json()
+    except httpx.TimeoutException:
+        outcome = "timeout"
+    except httpx.HTTPStatusError:
+        outcome = "http"
     except Exception:
-        return 0.0
+        outcome = "error"
+    finally:
+        BACKEND_LATENCY.labels(backend=backend, outcome=outcome).observe(
+            time.perf_counter() - start
+        )
+
+    if outcome != "success":
+        BACKEND_FAILURES.labels(backend=backend, reason=outcome).inc()
+        return None, outcome, status_code
+
+    if cache and CACHE_TTL_SECONDS > 0:
+        now = time.monotonic()
+        for stale in [k for k, (expires, _) in _cache.items() if expires <= now]:
+            del _cache[stale]
+        _cache[key] = (now + CACHE_TTL_SECONDS, data)
+    return data, outcome, status_code
 
-    data = resp.json()
-    if data.get("status") != "success":
+
+class _TempoUnavailable(Exception):
+    """Tempo no respondió (timeout, conexión o 5xx): no se prueban más estrategias."""
+
+
+async def _tempo_get(url: str, params: Dict[str, Any], cache: bool = True) -> Optional[Any]:
+    """GET a Tempo para las estrategias de conteo.
+
+    Devuelve el JSON, o None si Tempo rechaza la consulta con un código de
+    TEMPO_UNSUPPORTED_STATUS (estrategia no soportada: se prueba la
+    siguiente). Cualquier otro fallo lanza _TempoUnavailable.
+    """
+    data, outcome, status_code = await _backend_fetch("tempo", url, params, cache)
+    if outcome == "success":
+        return data
+    if outcome == "http" and status_code in TEMPO_UNSUPPORTED_STATUS:
+        return None
+    raise _TempoUnavailable(outcome)
+
+
+async def _query_prometheus(query: str) -> float:
+    """Ejecuta una consulta instantánea en Prometheus y devuelve un float (o 0.0 si no hay datos)."""
+    url = f"{PROMETHEUS_URL}/api/v1/query"
+    data = await _backend_get("prometheus", url, {"query": query})
+    if not isinstance(data, dict) or data.get("status") != "success":
         return 0.0
 
     result = data.get("data", {}).get("result", [])
@@ -68,14 +204,10 @@ async def _query_loki_errors(limit: int = 20, window_seconds: int = 300) -> Dict
     }
     url = f"{LOKI_URL}/loki/api/v1/query_range"
 
-    try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            resp = await client.get(url, params=params)
-            resp.raise_for_status()
-    except Exception:
+    data = await _backend_get("loki", url, params)
+    if not isinstance(data, dict):
         return {"error_count_5m": 0, "sample_errors": []}
 
-    data = resp.json()
     result = data.get("data", {}).get("result", [])
 
     sample_errors: List[str] = []
@@ -103,43 +235,113 @@ async def _query_loki_errors(limit: int = 20, window_seconds: int = 300) -> Dict
     }
 
 
-async def _query_tempo_counts(window_seconds: int = 300) -> Dict[str, Any]:
-    """Intenta hacer un conteo aproximado de trazas recientes y trazas con error.
+def _traceql_selector(*conditions: str) -> str:
+    """Construye un selector TraceQL acotado al servicio observado."""
+    parts = [f'resource.service.name = "{SERVICE_NAME}"', *conditions]
+    return "{ " + " && ".join(parts) + " }"
 
-    La API de Tempo puede variar según la configuración; aquí usamos un endpoint HTTP típico.
-    Si la llamada falla, devolvemos valores aproximados en 0.
-    """
-    now = int(time.time())
-    start = now - window_seconds
 
-    base = {
-        "recent_traces": 0,
-        "error_traces": 0,
-        "notes": "Conteo aproximado basado en la API HTTP de Tempo; ajustar a tu despliegue real.",
+async def _tempo_metrics_count(traceql: str, start: int, end: int) -> Optional[int]:
+    """Cuenta en el servidor con TraceQL metrics (`count_over_time`).
+
+    Solo viaja una serie con un punto por ventana. Devuelve None si el
+    endpoint no existe o no está habilitado (Tempo < 2.4 o sin metrics-generator).
+    """
+    url = f"{TEMPO_URL}/api/metrics/query_range"
+    params = {
+        "q": f"{traceql} | count_over_time()",
+        "start": start,
+        "end": end,
+        "step": f"{end - start}s",
     }
+    data = await _tempo_get(url, params)
+    if not isinstance(data, dict) or "series" not in data:
+        return None
+
+    total = 0.0
+    for series in data.get("series") or []:
+        for sample in series.get("samples") or []:
+            try:
+                total += float(sample.get("value", 0))
+            except (TypeError, ValueError):
+                continue
+    return int(total)
 
-    # Ejemplo de llamada a la API de búsqueda (puede requerir ajuste según tu stack):
+
+async def _tempo_search_count(traceql: str, start: int, end: int) -> Optional[Tuple[int, bool]]:
+    """Cuenta trazas con búsqueda TraceQL repartida en ventanas de tiempo.
+
+    El filtro se aplica en Tempo y solo se piden resúmenes (`spss=1`). No se
+    supone ningún orden en los resultados: si una ventana devuelve la página
+    completa, se parte en dos mitades y se consulta cada una; se deduplica por
+    traceID. Si se agotan las TEMPO_MAX_PAGES consultas con ventanas
+    pendientes (o una ventana de un segundo sigue llena), el conteo se marca
+    como truncado. Devuelve (conteo, truncado) o None si Tempo no acepta TraceQL.
+    """
+    url = f"{TEMPO_URL}/api/search"
+    seen: set = set()
+    windows = [(start, end)]
+    requests = 0
+    truncated = False
+
+    while windows:
+        if requests >= TEMPO_MAX_PAGES:
+            truncated = True
+            break
+        lo, hi = windows.pop()
+        params = {
+            "q": traceql,
+            "start": lo,
+            "end": hi,
+            "limit": TEMPO_PAGE_SIZE,
+            "spss": 1,
+        }
+        # La primera consulta es cacheable; las siguientes dependen de la ventana
+        try:
+            data = await _tempo_get(url, params, cache=requests == 0)
+        except _TempoUnavailable:
+            if requests == 0:
+                raise
+            # Tempo dejó de responder a mitad: el conteo parcial queda truncado
+            truncated = True
+            break
+        requests += 1
+        if not isinstance(data, dict):
+            if requests == 1:
+                return None
+            truncated = True
+            continue
+
+        traces = data.get("traces") or []
+        seen.update(t.get("traceID") for t in traces)
+        if len(traces) >= TEMPO_PAGE_SIZE:
+            if hi - lo <= 1:
+                truncated = True
+            else:
+                mid = (lo + hi) // 2
+                windows += [(lo, mid), (mid, hi)]
+
+    return len(seen), truncated
+
+
+async def _tempo_legacy_counts(start: int, end: int) -> Optional[Tuple[int, int]]:
+    """Heurística original para Tempo sin TraceQL: descarga hasta 100 resúmenes
+    y cuenta en el cliente las que traen status de error."""
     # GET /api/search?service=demo-app&start=<unix_s>&end=<unix_s>&limit=100
     search_url = f"{TEMPO_URL}/api/search"
     params_recent = {
         "service": SERVICE_NAME,
         "start": start,
-        "end": now,
+        "end": end,
         "limit": 100,
     }
 
-    try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            resp_recent = await client.get(search_url, params=params_recent)
-            resp_recent.raise_for_status()
-            data_recent = resp_recent.json()
-    except Exception:
-        return base
+    data_recent = await _tempo_get(search_url, params_recent)
+    if not isinstance(data_recent, dict):
+        return None
 
     traces = data_recent.get("traces", []) or data_recent.get("results", [])
-    recent_count = len(traces)
 
-    # Heurística simple: contar trazas con status error si el campo existe
     error_count = 0
     for t in traces:
         # el formato real depende de la versión; intentamos campos típicos
@@ -148,8 +350,69 @@ async def _query_tempo_counts(window_seconds: int = 300) -> Dict[str, Any]:
         if code in ("ERROR", "Error", 2):
             error_count += 1
 
-    base["recent_traces"] = recent_count
-    base["error_traces"] = error_count
+    return len(traces), error_count
+
+
+async def _query_tempo_counts(window_seconds: int = 300) -> Dict[str, Any]:
+    """Cuenta trazas recientes y trazas con error en la ventana indicada.
+
+    Orden de estrategias (se usa la primera que responda):
+    1. `traceql-metrics`: `count_over_time()` sobre el span raíz; nada se descarga.
+    2. `traceql-search`: búsqueda por ventanas con los mismos selectores de
+       span raíz (error = raíz con `status = error`), filtrados en el servidor.
+    3. `legacy-search`: heurística del cliente para versiones de Tempo sin TraceQL.
+    Solo se pasa a la siguiente si Tempo rechaza la consulta (400/404); si no
+    responde (timeout, conexión, 5xx) no se insiste. Si todo falla,
+    devolvemos valores en 0.
+    """
+    now = int(time.time())
+    start = now - window_seconds
+
+    base = {
+        "recent_traces": 0,
+        "error_traces": 0,
+        "method": "unavailable",
+        "truncated": False,
+        "notes": "Conteo basado en la API HTTP de Tempo; ajustar a tu despliegue real.",
+    }
+
+    try:
+        return await _tempo_counts_by_strategy(base, start, now)
+    except _TempoUnavailable:
+        return base
+
+
+async def _tempo_counts_by_strategy(base: Dict[str, Any], start: int, now: int) -> Dict[str, Any]:
+    """Prueba las estrategias de `_query_tempo_counts` en orden sobre `base`."""
+    # Un span raíz por traza: contar spans raíz equivale a contar trazas
+    root_q = _traceql_selector("nestedSetParent = -1")
+    root_error_q = _traceql_selector("nestedSetParent = -1", "status = error")
+    recent = await _tempo_metrics_count(root_q, start, now)
+    errors = await _tempo_metrics_count(root_error_q, start, now) if recent is not None else None
+    if recent is not None and errors is not None:
+        base.update(recent_traces=recent, error_traces=errors, method="traceql-metrics")
+        return base
+
+    # Misma definición de error en ambas rutas: span raíz con status = error
+    recent_page = await _tempo_search_count(root_q, start, now)
+    error_page = await _tempo_search_count(root_error_q, start, now) if recent_page is not None else None
+    if recent_page is not None and error_page is not None:
+        base.update(
+            recent_traces=recent_page[0],
+            error_traces=error_page[0],
+            method="traceql-search",
+            truncated=recent_page[1] or error_page[1],
+        )
+        return base
+
+    legacy = await _tempo_legacy_counts(start, now)
+    if legacy is not None:
+        base.update(
+            recent_traces=legacy[0],
+            error_traces=legacy[1],
+            method="legacy-search",
+            truncated=legacy[0] >= 100,
+        )
     return base
 
 
@@ -162,6 +425,12 @@ async def healthz() -> Dict[str, str]:
     return {"status": "ok", "component": "mcp-style-gateway"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    """Métricas propias del gateway en formato de exposición de Prometheus."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 @app.get("/api/metrics-summary")
 async def metrics_summary() -> Dict[str, Any]:
     """Resumen compacto de métricas clave para demo-app."""